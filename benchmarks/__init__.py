@@ -0,0 +1,3 @@
+"""
+Benchmarks für die Abruf-Pipeline gegen einen lokalen Stub-Server (siehe benchmarks.stub_server und benchmarks.run).
+"""
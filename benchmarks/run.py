@@ -0,0 +1,106 @@
+"""
+Benchmark-Suite für die Abruf-Pipeline: misst Laufzeit, Anzahl Upstream-Requests und Speicher-Peak je Szenario,
+jeweils mit kaltem (leeres Cache-Verzeichnis, frischer Prozess) und warmem Cache (zweiter Lauf im selben Prozess).
+Alle Requests gehen an einen lokalen Stub-Server (benchmarks.stub_server), es werden keine Credits verbraucht.
+
+    python -m benchmarks.run --latency-ms 50
+    python -m benchmarks.run --scenarios one-token-one-year --json bench.json
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date
+
+import requests
+
+from .stub_server import SYNTHETIC_PLATFORMS, StubServer, token_address
+
+SCENARIOS = {
+    "one-token-one-year": {"tokens": 1, "start": "2023-01-01", "end": "2023-12-31"},
+    "multi-token": {"tokens": 25, "start": "2023-01-01", "end": "2023-12-31"},
+    "multi-year": {"tokens": 1, "start": "2019-03-15", "end": "2024-06-30"},
+    "fx-per-day": {"tokens": 1, "start": "2023-01-01", "end": "2023-12-31", "disable_timeseries": True},
+}
+
+def _addresses(count: int, platform: str = "ethereum") -> list:
+    offset = SYNTHETIC_PLATFORMS.index(platform)
+    return [token_address(offset + i * len(SYNTHETIC_PLATFORMS)) for i in range(count)]
+
+def _worker(scenario: dict, stub_url: str) -> list:
+    """
+    Läuft im Kindprozess (Umgebungsvariablen zeigen auf Stub-Server und leeres Cache-Verzeichnis): führt das Szenario
+    zweimal aus (kalt, warm) und liefert je Phase die Messwerte.
+    """
+    from token_prices import run_pipeline
+
+    addresses = _addresses(scenario["tokens"])
+    start, end = date.fromisoformat(scenario["start"]), date.fromisoformat(scenario["end"])
+    phases = []
+    for phase in ("cold", "warm"):
+        requests.get(f"{stub_url}/__reset", timeout=10)
+        tracemalloc.start()
+        started = time.perf_counter()
+        table, failed = run_pipeline(addresses, "ethereum", start, end, "benchmark-key")
+        wall = time.perf_counter() - started
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        stats = requests.get(f"{stub_url}/__stats", timeout=10).json()
+        phases.append({
+            "phase": phase, "wall_s": round(wall, 3), "requests": stats["requests"], "by_path": stats["by_path"],
+            "peak_mib": round(peak / 2 ** 20, 1), "rows": len(table), "failed": len(failed)
+        })
+    return phases
+
+def run_scenario(name: str, latency_ms: float, jitter_ms: float, error_rate: float) -> list:
+    scenario = SCENARIOS[name]
+    stub = StubServer(
+        latency_s=latency_ms / 1000, jitter_s=jitter_ms / 1000, error_rate=error_rate,
+        disable_timeseries=scenario.get("disable_timeseries", False)
+    )
+    with stub, tempfile.TemporaryDirectory() as cache_dir:
+        env = {
+            **os.environ,
+            "TOKEN_PRICES_CACHE_DIR": cache_dir,
+            "TOKEN_PRICES_CMC_BASE_URL": stub.url,
+            "TOKEN_PRICES_FX_BASE_URL": stub.url,
+        }
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.run", "--worker", json.dumps(scenario), "--stub-url", stub.url],
+            env=env, check=True, capture_output=True, text=True
+        ).stdout
+    return [{"scenario": name, **phase} for phase in json.loads(output.strip().splitlines()[-1])]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.run", description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS),
+                        help=f"Kommagetrennte Szenarien (Standard: alle): {', '.join(SCENARIOS)}")
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="Simulierte Upstream-Latenz je Request.")
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Anteil injizierter 503-Antworten (0..1).")
+    parser.add_argument("--json", help="Ergebnisse zusätzlich als JSON in diese Datei schreiben.")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    parser.add_argument("--stub-url", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        print(json.dumps(_worker(json.loads(args.worker), args.stub_url)))
+        return
+
+    results = []
+    print(f"{'Szenario':<22} {'Phase':<5} {'Zeit [s]':>9} {'Requests':>9} {'Peak [MiB]':>11} {'Zeilen':>8}")
+    for name in args.scenarios.split(","):
+        for result in run_scenario(name.strip(), args.latency_ms, args.jitter_ms, args.error_rate):
+            results.append(result)
+            print(f"{result['scenario']:<22} {result['phase']:<5} {result['wall_s']:>9.3f} {result['requests']:>9} "
+                  f"{result['peak_mib']:>11.1f} {result['rows']:>8}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,263 @@
+"""
+Lokaler Stub-Server für CoinMarketCap (/v1/cryptocurrency/map, /v2/cryptocurrency/ohlcv/historical) und
+exchangerate.host (/timeseries, /YYYY-MM-DD) mit einstellbarer Latenz und Fehlerinjektion.
+
+Antworten werden aus einem Fixture-Verzeichnis wiedergegeben (Record/Replay). Für nicht aufgezeichnete Requests
+erzeugt der Server deterministische synthetische Daten oder – im Record-Modus – leitet sie an den echten
+Upstream weiter und speichert die Antwort als Fixture.
+
+    python -m benchmarks.stub_server --port 8765 --latency-ms 80 --error-rate 0.02
+"""
+import argparse
+import functools
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+import requests
+
+UPSTREAMS = {
+    "cmc": "https://pro-api.coinmarketcap.com",
+    "fx": "https://api.exchangerate.host"
+}
+# Parameter, die nicht zur Identität eines aufgezeichneten Requests gehören
+CREDENTIAL_PARAMS = {"access_key"}
+
+SYNTHETIC_LISTING_SIZE = 12000
+SYNTHETIC_PLATFORMS = ["ethereum", "arbitrum", "optimism"]
+SYNTHETIC_FX_RATES = {"EUR": 0.92, "CHF": 0.89, "GBP": 0.79, "JPY": 149.5, "USD": 1.0}
+
+def token_address(index: int) -> str:
+    """
+    Deterministische Contract-Adresse des synthetischen Tokens mit dem Index index (CMC-ID = index + 1).
+    """
+    return "0x" + hashlib.sha1(f"token-{index}".encode()).hexdigest()
+
+@functools.lru_cache(maxsize=None)
+def _synthetic_address_index() -> dict:
+    return {token_address(index): index for index in range(SYNTHETIC_LISTING_SIZE)}
+
+def _synthetic_token(index: int) -> dict:
+    platform = SYNTHETIC_PLATFORMS[index % len(SYNTHETIC_PLATFORMS)]
+    return {
+        "id": index + 1,
+        "name": f"Token {index}",
+        "symbol": f"T{index}",
+        "slug": f"token-{index}",
+        "platform": {"slug": platform, "name": platform.title(), "token_address": token_address(index)}
+    }
+
+def _days(start: date, end: date):
+    day = start
+    while day <= end:
+        yield day
+        day += timedelta(days=1)
+
+def _synthetic_price(coin_id: int, day: date) -> float:
+    return round(1 + coin_id % 97 + (day.toordinal() % 365) / 100, 6)
+
+def _synthetic_rate(quote: str, day: date) -> float:
+    return round(SYNTHETIC_FX_RATES.get(quote, 1.0) * (1 + (day.toordinal() % 30) / 1000), 6)
+
+def synthetic_response(path: str, params: dict):
+    """
+    Erzeugt eine deterministische Antwort (Status, JSON) im Format des jeweiligen Upstreams.
+    """
+    if path == "/v1/cryptocurrency/map":
+        if "address" in params:
+            index = _synthetic_address_index().get(params["address"].lower())
+            return 200, {"status": {"error_code": 0}, "data": [_synthetic_token(index)] if index is not None else []}
+        start = int(params.get("start", 1))
+        limit = int(params.get("limit", 5000))
+        indexes = range(start - 1, min(start - 1 + limit, SYNTHETIC_LISTING_SIZE))
+        return 200, {"status": {"error_code": 0}, "data": [_synthetic_token(index) for index in indexes]}
+    if path == "/v2/cryptocurrency/ohlcv/historical":
+        start = date.fromisoformat(params["time_start"][:10])
+        end = date.fromisoformat(params["time_end"][:10])
+        converts = (params.get("convert") or "USD").split(",")
+        data = {}
+        for coin_id in (int(value) for value in params["id"].split(",")):
+            quotes = []
+            for day in _days(start, end):
+                usd = _synthetic_price(coin_id, day)
+                quotes.append({
+                    "time_open": f"{day}T00:00:00.000Z",
+                    "time_close": f"{day}T23:59:59.999Z",
+                    "quote": {
+                        quote: {
+                            "open": usd * _synthetic_rate(quote, day), "high": usd * _synthetic_rate(quote, day) * 1.02,
+                            "low": usd * _synthetic_rate(quote, day) * 0.98, "close": usd * _synthetic_rate(quote, day),
+                            "volume": 1e6 * usd, "market_cap": 1e8 * usd, "timestamp": f"{day}T23:59:59.999Z"
+                        }
+                        for quote in converts
+                    }
+                })
+            data[str(coin_id)] = {"id": coin_id, "name": f"Token {coin_id - 1}", "quotes": quotes}
+        return 200, {"status": {"error_code": 0}, "data": data}
+    symbols = (params.get("symbols") or "EUR").split(",")
+    if path == "/timeseries":
+        start = date.fromisoformat(params["start_date"])
+        end = date.fromisoformat(params["end_date"])
+        rates = {str(day): {symbol: _synthetic_rate(symbol, day) for symbol in symbols} for day in _days(start, end)}
+        return 200, {"success": True, "timeseries": True, "base": params.get("base", "USD"), "rates": rates}
+    try:
+        day = date.fromisoformat(path.strip("/"))
+    except ValueError:
+        return 404, {"error": f"Unbekannter Pfad: {path}"}
+    rates = {symbol: _synthetic_rate(symbol, day) for symbol in symbols}
+    return 200, {"success": True, "date": str(day), "base": params.get("base", "USD"), "rates": rates}
+
+def _upstream_for(path: str) -> str:
+    return UPSTREAMS["cmc"] if path.startswith(("/v1/", "/v2/")) else UPSTREAMS["fx"]
+
+class StubServer:
+    """
+    Stub-Server in einem Hintergrund-Thread. latency_s (+/- jitter_s) verzögert jede Antwort, error_rate ist der
+    Anteil der Requests, die mit error_status beantwortet werden. Mit disable_timeseries antwortet /timeseries mit 404
+    (Provider ohne Zeitreihen-Endpoint). Aufgezeichnete Antworten werden aus fixtures_dir wiedergegeben;
+    mit record=True werden fehlende Antworten beim echten Upstream abgerufen und dort gespeichert.
+    """
+
+    def __init__(self, port: int = 0, latency_s: float = 0.0, jitter_s: float = 0.0, error_rate: float = 0.0,
+                 error_status: int = 503, disable_timeseries: bool = False, fixtures_dir: str = None,
+                 record: bool = False, seed: int = 0):
+        self.latency_s = latency_s
+        self.jitter_s = jitter_s
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.disable_timeseries = disable_timeseries
+        self.fixtures_dir = fixtures_dir
+        self.record = record
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.request_counts = {}
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", port), self._handler_class())
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"requests": sum(self.request_counts.values()), "by_path": dict(self.request_counts)}
+
+    def reset(self):
+        with self._lock:
+            self.request_counts.clear()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _fixture_path(self, path: str, params: dict) -> str:
+        identity = json.dumps(
+            [path, sorted((k, v) for k, v in params.items() if k not in CREDENTIAL_PARAMS)], separators=(",", ":")
+        )
+        return os.path.join(self.fixtures_dir, hashlib.sha1(identity.encode()).hexdigest() + ".json")
+
+    def respond(self, path: str, params: dict, headers: dict):
+        """
+        Liefert (Status, Body-Bytes) für einen Request; zählt ihn und wendet Latenz und Fehlerinjektion an.
+        """
+        with self._lock:
+            bucket = "/{date}" if path[1:2].isdigit() else path
+            self.request_counts[bucket] = self.request_counts.get(bucket, 0) + 1
+            delay = max(0.0, self.latency_s + self._random.uniform(-self.jitter_s, self.jitter_s))
+            inject_error = self._random.random() < self.error_rate
+        if delay:
+            time.sleep(delay)
+        if inject_error:
+            return self.error_status, json.dumps({"error": "injected"}).encode()
+        if self.disable_timeseries and path == "/timeseries":
+            return 404, json.dumps({"error": "timeseries disabled"}).encode()
+
+        if self.fixtures_dir:
+            fixture_path = self._fixture_path(path, params)
+            if os.path.exists(fixture_path):
+                with open(fixture_path, encoding="utf-8") as f:
+                    fixture = json.load(f)
+                return fixture["status"], json.dumps(fixture["body"]).encode()
+            if self.record:
+                upstream_headers = {k: v for k, v in headers.items() if k.lower() == "x-cmc_pro_api_key"}
+                response = requests.get(_upstream_for(path) + path, params=params, headers=upstream_headers, timeout=60)
+                os.makedirs(self.fixtures_dir, exist_ok=True)
+                with open(fixture_path, "w", encoding="utf-8") as f:
+                    json.dump({"path": path, "params": {k: v for k, v in params.items() if k not in CREDENTIAL_PARAMS},
+                               "status": response.status_code, "body": response.json()}, f)
+                return response.status_code, response.content
+        status, body = synthetic_response(path, params)
+        return status, json.dumps(body).encode()
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                parts = urlsplit(self.path)
+                if parts.path == "/__stats":
+                    status, body = 200, json.dumps(server.stats()).encode()
+                elif parts.path == "/__reset":
+                    server.reset()
+                    status, body = 200, b"{}"
+                else:
+                    status, body = server.respond(parts.path, dict(parse_qsl(parts.query)), dict(self.headers))
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                if status == 429:
+                    self.send_header("Retry-After", "1")
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.stub_server", description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Mittlere Antwortlatenz in Millisekunden.")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="Gleichverteilte Abweichung der Latenz.")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Anteil der Requests mit Fehlerantwort (0..1).")
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--disable-timeseries", action="store_true", help="/timeseries mit 404 beantworten.")
+    parser.add_argument("--fixtures", help="Verzeichnis mit aufgezeichneten Antworten.")
+    parser.add_argument("--record", action="store_true", help="Fehlende Fixtures beim echten Upstream aufzeichnen.")
+    args = parser.parse_args(argv)
+    server = StubServer(
+        args.port, args.latency_ms / 1000, args.jitter_ms / 1000, args.error_rate, args.error_status,
+        args.disable_timeseries, args.fixtures, args.record
+    )
+    print(f"Stub-Server läuft auf {server.url} (Strg+C zum Beenden)")
+    try:
+        server._httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server._httpd.server_close()
+
+if __name__ == "__main__":
+    main()
@@ -1,36 +1,84 @@
+import os
 import streamlit as st
-import requests
-import pandas as pd
-from datetime import datetime, timedelta, date, timezone
+from datetime import datetime, date
+
+from token_prices import (
+    CHAIN_PLATFORMS,
+    CONVERSION_BOTH,
+    CONVERSION_DIRECT,
+    CONVERSION_FX,
+    FX_MAX_WORKERS,
+    SUPPORTED_CURRENCIES,
+    cache_footprint,
+    collect_metrics,
+    get_concurrency_controller,
+    get_credit_ledger,
+    get_usage_ledger,
+    key_fingerprint,
+    load_price_table,
+    parse_contract_addresses,
+    purge_caches,
+    resolve_tokens,
+    stage,
+)
 
 # Seitenkonfiguration
 st.set_page_config(page_title="Token Historical Prices", layout="wide")
 
-st.title("Token Historical Prices in USD & EUR")
+st.title("Token Historical Prices in USD & Fiat")
 st.markdown(
     """
     Diese Webapp ruft für einen angegebenen Token (über Contract-Adresse) auf einer unterstützten Chain (Ethereum, Arbitrum, Optimism)
-    historische Preisdaten (USD) von CoinMarketCap ab, holt dazu den historischen USD/EUR-Kurs von exchangerate.host 
-    und berechnet den Tokenpreis in EUR.
+    historische Preisdaten (USD) von CoinMarketCap ab und berechnet den Tokenpreis in den gewählten Zielwährungen
+    (z. B. EUR, CHF, GBP): entweder über die historischen USD-Kurse von exchangerate.host oder direkt mit den
+    Fiat-Kursen von CoinMarketCap (optional mit FX-Abgleich).
 
     Zusätzlich kannst du hier deine API Keys eingeben – weshalb dein CoinMarketCap API Key (Pro) verwendet wird.
     
-    Alle Daten des gewählten Jahres werden als Tabelle angezeigt und können als CSV heruntergeladen werden.
+    Alle Daten des gewählten Zeitraums werden als Tabelle angezeigt und können als CSV heruntergeladen werden.
+    Im Batch-Modus kannst du mehrere Contract-Adressen einfügen oder als Datei hochladen und erhältst eine gemeinsame Tabelle.
     """
 )
 
-# Mapping der unterstützen Chains (Plattformen) – ggf. anpassen, falls die Bezeichnungen in CoinMarketCap anders lauten
-chain_mapping = {
-    "Ethereum": "ethereum",
-    "Arbitrum": "arbitrum",
-    "Optimism": "optimism"
+# Schaltet den Button "Cache leeren" frei (nur für Betreiber; sonst bleibt das Leeren der Kommandozeile vorbehalten)
+ALLOW_UI_PURGE = os.environ.get("TOKEN_PRICES_ALLOW_UI_PURGE", "") == "1"
+
+# Mapping der unterstützen Chains (Plattformen), siehe token_prices.pipeline
+chain_mapping = CHAIN_PLATFORMS
+
+# Auswahl der Fiat-Umrechnung (siehe token_prices.pipeline)
+conversion_options = {
+    "Über USD-Wechselkurse (exchangerate.host)": CONVERSION_FX,
+    "Direkt von CoinMarketCap": CONVERSION_DIRECT,
+    "Direkt, mit FX-Abgleich": CONVERSION_BOTH
 }
 
 with st.sidebar:
     st.header("Einstellungen")
     selected_chain = st.selectbox("Chain auswählen", list(chain_mapping.keys()))
-    contract_address = st.text_input("Token Contract-Adresse", "").strip()
-    year = st.number_input("Jahr (vollständig)", min_value=2000, max_value=2100, value=datetime.now().year, step=1)
+    batch_mode = st.radio("Modus", ["Einzelner Token", "Batch (mehrere Token)"], horizontal=True) != "Einzelner Token"
+    if batch_mode:
+        contract_address = ""
+        batch_addresses_text = st.text_area("Token Contract-Adressen", "",
+                                            help="Eine oder mehrere Contract-Adressen, getrennt durch Zeilenumbrüche, Kommas oder Leerzeichen.")
+        batch_addresses_file = st.file_uploader("Adressliste hochladen (CSV/TXT)", type=["csv", "txt"])
+    else:
+        contract_address = st.text_input("Token Contract-Adresse", "").strip()
+        batch_addresses_text, batch_addresses_file = "", None
+    current_year = datetime.now().year
+    start_date_input = st.date_input("Von", value=date(current_year, 1, 1),
+                                     min_value=date(2000, 1, 1), max_value=date(2100, 12, 31))
+    end_date_input = st.date_input("Bis", value=date(current_year, 12, 31),
+                                   min_value=date(2000, 1, 1), max_value=date(2100, 12, 31))
+    
+    currencies = tuple(st.multiselect(
+        "Zielwährungen", SUPPORTED_CURRENCIES, default=["EUR"],
+        help="Alle Wechselkurse werden gemeinsam in einem Abruf geladen; je Währung entstehen zwei Spalten."
+    ))
+    conversion = conversion_options[st.radio(
+        "Fiat-Umrechnung", list(conversion_options.keys()),
+        help="Direkt: CoinMarketCap liefert die Fiat-Kurse in derselben Antwort (convert=USD,EUR,...), ohne Wechselkurs-Requests."
+    )]
     
     st.markdown("### API Keys (optional)")
     # Hier wird der CoinMarketCap API Key erwartet – passe das Label ggf. an
@@ -38,134 +86,162 @@ with st.sidebar:
                                 help="Gib hier deinen CoinMarketCap API Key ein (Pro-Version erforderlich für historische Daten).").strip()
     exchange_rate_api_key = st.text_input("ExchangeRate API Key", type="password",
                                           help="Optional: Falls du einen eigenen API Key hast.").strip()
+    fx_max_workers = st.slider("Parallele FX-Requests", min_value=1, max_value=32, value=FX_MAX_WORKERS,
+                               help="Obergrenze gleichzeitiger Requests für Tage, die einzeln abgerufen werden müssen; "
+                                    "innerhalb davon passt sich die Nebenläufigkeit an den Provider an.")
     
     fetch_button = st.button("Daten abrufen")
+    
+    # Abgeschlossene Zeiträume laufen im Cache nie ab; hier lassen sie sich bei Bedarf gezielt verwerfen. Die Caches
+    # gelten für alle Sessions (geleerte Kurse kosten erneut CMC Credits), daher nur mit ALLOW_UI_PURGE
+    if ALLOW_UI_PURGE:
+        with st.expander("Cache"):
+            purge_persistent = st.checkbox("Auch gespeicherte Kurse löschen (Parquet/SQLite)")
+            if st.button("Cache leeren"):
+                purge_caches(persistent=purge_persistent)
+                st.success("Cache geleert.")
 
-@st.cache_data(ttl=3600)
-def fetch_token_info_cmc(contract_addr: str, platform: str, cmc_api_key: str):
-    """
-    Ruft Token-Informationen von CoinMarketCap anhand der Contract-Adresse ab.
-    Verwendet dazu den /v1/cryptocurrency/map Endpoint.
-    """
-    url = "https://pro-api.coinmarketcap.com/v1/cryptocurrency/map"
-    params = {"address": contract_addr}
-    # Optional: Filterung nach Plattform (z. B. Ethereum, Arbitrum, Optimism)
-    if platform:
-        params["platform"] = platform
-    headers = {"X-CMC_PRO_API_KEY": cmc_api_key}
-    response = requests.get(url, params=params, headers=headers)
-    if response.status_code != 200:
-        raise Exception(
-            f"Fehler beim Abruf der Token-Informationen (CMC) ({response.status_code}). Response: {response.text}"
-        )
-    data = response.json().get("data", [])
-    if not data:
-        raise Exception("Keine Token-Informationen gefunden. Bitte prüfe die Contract-Adresse und den API Key.")
-    # Wähle den ersten Treffer (ggf. weitere Logik implementieren, wenn mehrere Ergebnisse vorliegen)
-    return data[0]
-
-@st.cache_data(ttl=3600)
-def fetch_market_chart_cmc(coin_id: int, start_dt: datetime, end_dt: datetime, cmc_api_key: str):
-    """
-    Ruft historische OHLCV-Daten (täglich) von CoinMarketCap für den angegebenen Zeitraum ab.
-    Nutzt den /v2/cryptocurrency/ohlcv/historical Endpoint.
-    """
-    url = "https://pro-api.coinmarketcap.com/v2/cryptocurrency/ohlcv/historical"
-    params = {
-        "id": coin_id,
-        "time_start": start_dt.strftime("%Y-%m-%d"),
-        "time_end": end_dt.strftime("%Y-%m-%d"),
-        "interval": "daily"
-    }
-    headers = {"X-CMC_PRO_API_KEY": cmc_api_key}
-    response = requests.get(url, params=params, headers=headers)
-    if response.status_code != 200:
-        raise Exception(
-            f"Fehler beim Abruf der Preisdaten (CMC) ({response.status_code}). Response: {response.text}"
-        )
-    return response.json()
+# Ergebnisse werden im Session State gehalten, damit Downloads, Sortieren und Diagramme (jede Interaktion startet das
+# Skript neu) ohne erneuten Abruf funktionieren; Schlüssel ist (Chain, Adressen, Zeitraum, Währungen, Umrechnung)
+RESULTS_MAX = 5
 
-@st.cache_data(ttl=86400)
-def fetch_exchange_rate(date_str: str, exchange_api_key: str = None):
-    """
-    Ruft den historischen USD/EUR Wechselkurs für ein bestimmtes Datum von exchangerate.host ab.
-    """
-    url = f"https://api.exchangerate.host/{date_str}"
-    params = {"base": "USD", "symbols": "EUR"}
-    if exchange_api_key:
-        params["access_key"] = exchange_api_key
-    response = requests.get(url, params=params)
-    if response.status_code == 200:
-        data = response.json()
-        return data.get("rates", {}).get("EUR", None)
-    else:
-        return None
+if batch_mode:
+    addresses = parse_contract_addresses(
+        batch_addresses_text,
+        batch_addresses_file.getvalue().decode("utf-8", errors="ignore") if batch_addresses_file else ""
+    )
+else:
+    addresses = [contract_address] if contract_address else []
+result_key = (
+    chain_mapping[selected_chain], tuple(address.lower() for address in addresses), start_date_input, end_date_input,
+    currencies, conversion
+)
+results = st.session_state.setdefault("results", {})
 
 if fetch_button:
-    if not contract_address:
+    if not addresses:
         st.error("Bitte gib eine Token Contract-Adresse ein.")
+    elif not currencies:
+        st.error("Bitte wähle mindestens eine Zielwährung aus.")
+    elif start_date_input > end_date_input:
+        st.error("Das Startdatum muss vor dem Enddatum liegen.")
     elif not cmc_api_key:
         st.error("Bitte gib einen CoinMarketCap API Key ein.")
     else:
-        try:
-            with st.spinner("Token-Informationen werden abgerufen..."):
-                token_info = fetch_token_info_cmc(contract_address, chain_mapping[selected_chain], cmc_api_key)
-            st.success(f"Token gefunden: {token_info.get('name', 'Unbekannt')} ({token_info.get('symbol', '').upper()})")
+        results.pop(result_key, None)
+        notices = []
+        with collect_metrics() as run_metrics:
+            try:
+                with st.spinner("Token-Informationen werden abgerufen..."), stage("resolve_tokens"):
+                    tokens, failed = resolve_tokens(addresses, chain_mapping[selected_chain], cmc_api_key)
+                # Im Einzelmodus bricht ein Fehler wie bisher den Abruf ab, im Batch-Modus wird der Token übersprungen
+                if failed and not batch_mode:
+                    raise failed[0][1]
+                if batch_mode:
+                    notices.append(("success", f"{len(tokens)} von {len(addresses)} Token gefunden."))
+                    if failed:
+                        notices.append(
+                            ("warning", "Nicht gefunden:\n\n" + "\n\n".join(f"{address}: {e}" for address, e in failed))
+                        )
+                else:
+                    token_info = tokens[0][1]
+                    notices.append(
+                        ("success", f"Token gefunden: {token_info.get('name', 'Unbekannt')} ({token_info.get('symbol', '').upper()})")
+                    )
             
-            token_id = token_info.get("id")
-            if token_id is None:
-                raise Exception("Kein Token ID in den abgerufenen Daten gefunden.")
+                # Preisdaten und Wechselkurse über dieselbe Pipeline wie die Kommandozeile (token_prices.pipeline)
+                with st.spinner("Preisdaten und Wechselkurse werden abgerufen..."):
+                    progress_bar = st.progress(0.0, text="Preisdaten werden abgerufen...")
+                    df = load_price_table(
+                        tokens, start_date_input, end_date_input, cmc_api_key, exchange_rate_api_key, fx_max_workers,
+                        progress_callback=lambda done, total: progress_bar.progress(
+                            done / total, text=f"Fehlende Wechselkurse werden einzeln abgerufen ({done}/{total})..."
+                        ),
+                        conversion=conversion, currencies=currencies
+                    )
+                    progress_bar.empty()
             
-            # Definiere den Zeitraum des gesamten Jahres (UTC)
-            start_dt = datetime(year, 1, 1, tzinfo=timezone.utc)
-            end_dt = datetime(year, 12, 31, tzinfo=timezone.utc)
-            
-            with st.spinner("Historische Preisdaten werden abgerufen..."):
-                market_data = fetch_market_chart_cmc(token_id, start_dt, end_dt, cmc_api_key)
-            
-            # Die OHLCV-Daten werden unter market_data["data"]["quotes"] bereitgestellt
-            quotes = market_data.get("data", {}).get("quotes", [])
-            if not quotes:
-                st.error("Es wurden keine Preisdaten gefunden.")
-            else:
-                # Erstelle ein Mapping: Datum (YYYY-MM-DD) -> Schlusskurs (close price in USD)
-                daily_quotes = {}
-                for record in quotes:
-                    # Beispiel: "time_close": "2025-01-01T23:59:59.000Z"
-                    date_str = record.get("time_close", "")[:10]
-                    if date_str:
-                        close_price = record.get("quote", {}).get("USD", {}).get("close", None)
-                        daily_quotes[date_str] = close_price
-                
-                # Erstelle für jeden Tag des Jahres einen Eintrag (falls keine Daten vorhanden sind, bleibt der Preis None)
-                results = []
-                current_date = date(year, 1, 1)
-                end_date_obj = date(year, 12, 31)
-                while current_date <= end_date_obj:
-                    day_str = current_date.strftime("%Y-%m-%d")
-                    token_price_usd = daily_quotes.get(day_str, None)
-                    usd_to_eur = fetch_exchange_rate(day_str, exchange_rate_api_key)
-                    token_price_eur = token_price_usd * usd_to_eur if token_price_usd is not None and usd_to_eur is not None else None
-                    
-                    results.append({
-                        "Date": day_str,
-                        "Token Price USD": token_price_usd,
-                        "USD/EUR": usd_to_eur,
-                        "Token Price EUR": token_price_eur
-                    })
-                    current_date += timedelta(days=1)
+                # Ein Eintrag für jeden Tag des Zeitraums; Tokens ohne einen einzigen USD-Kurs werden gemeldet
+                prices_found = df.groupby("Contract Address")["Token Price USD"].count()
+                without_prices = [address for address, _ in tokens if not prices_found.get(address, 0)]
+                if len(without_prices) == len(tokens):
+                    st.error("Es wurden keine Preisdaten gefunden.")
+                else:
+                    if without_prices:
+                        notices.append(("warning", "Keine Preisdaten gefunden für: " + ", ".join(without_prices)))
+                    start_date_obj = start_date_input
+                    end_date_obj = end_date_input
+                    if batch_mode:
+                        file_name = f"tokens_{start_date_obj}_{end_date_obj}.csv"
+                    else:
+                        # Im Einzelmodus ohne die Spalten der Long-Tabelle
+                        df = df.drop(columns=["Symbol", "Contract Address"])
+                        file_name = f"{token_info.get('symbol', 'token')}_{start_date_obj}_{end_date_obj}.csv"
                 
-                df = pd.DataFrame(results)
-                st.subheader(f"Preisdaten für {year}")
-                st.dataframe(df, use_container_width=True)
+                    # Der Export wird einmal kodiert und mit der Tabelle gespeichert
+                    with stage("csv_encode"):
+                        csv_data = df.to_csv(index=False).encode("utf-8")
+                    results[result_key] = {
+                        "notices": notices,
+                        "title": f"Preisdaten für {start_date_obj:%d.%m.%Y} bis {end_date_obj:%d.%m.%Y}",
+                        "df": df,
+                        "csv": csv_data,
+                        "file_name": file_name
+                    }
+                    # Nur die letzten RESULTS_MAX Ergebnisse bleiben im Session State
+                    while len(results) > RESULTS_MAX:
+                        results.pop(next(iter(results)))
                 
-                csv_data = df.to_csv(index=False).encode("utf-8")
-                st.download_button(
-                    label="CSV herunterladen",
-                    data=csv_data,
-                    file_name=f"{token_info.get('symbol', 'token')}_{year}.csv",
-                    mime="text/csv"
-                )
-                
-        except Exception as e:
-            st.error(f"Fehler: {e}")
\ No newline at end of file
+            except Exception as e:
+                st.error(f"Fehler: {e}")
+        st.session_state["run_metrics"] = run_metrics
+
+result = results.get(result_key)
+if result is not None:
+    for level, text in result["notices"]:
+        getattr(st, level)(text)
+    df = result["df"]
+    st.subheader(result["title"])
+    st.dataframe(df, use_container_width=True)
+    
+    # Verlauf des gewählten Preises; im Batch-Modus eine Linie je Token
+    chart_column = st.selectbox(
+        "Diagramm", [column for column in df.columns if column.startswith("Token Price") and "(FX)" not in column]
+    )
+    if "Symbol" in df.columns:
+        chart_data = df.pivot_table(index="Date", columns="Symbol", values=chart_column, aggfunc="last")
+    else:
+        chart_data = df.set_index("Date")[[chart_column]]
+    st.line_chart(chart_data)
+    
+    st.download_button(
+        label="CSV herunterladen",
+        data=result["csv"],
+        file_name=result["file_name"],
+        mime="text/csv"
+    )
+
+if "run_metrics" in st.session_state:
+    run_metrics = st.session_state["run_metrics"]
+    # Laufzeit-Metriken des letzten Abrufs (Requests, Latenzen je Host, Cache-Treffer, Dauer der Stufen)
+    with st.expander("Laufzeit-Metriken"):
+        st.json(run_metrics.to_dict())
+        st.download_button(
+            label="Metriken als JSON herunterladen",
+            data=run_metrics.to_json().encode("utf-8"),
+            file_name="run_metrics.json",
+            mime="application/json"
+        )
+        # Requests, die mit den eigenen Keys seit dem Start des Servers ausgelöst wurden (alle Sessions)
+        usage = get_usage_ledger().to_dict()
+        st.markdown("**Nutzung der eigenen API Keys (seit Serverstart)**")
+        st.json({
+            label: usage.get(key_fingerprint(key), {})
+            for label, key in (("CoinMarketCap", cmc_api_key), ("ExchangeRate", exchange_rate_api_key))
+        })
+        st.markdown("**Adaptive Nebenläufigkeit je Host**")
+        st.json(get_concurrency_controller().to_dict())
+        st.markdown("**Speicherbedarf der In-Memory-Caches (dieser Worker)**")
+        st.json(cache_footprint())
+        st.markdown("**CMC Credits im laufenden Monat**")
+        st.json(get_credit_ledger().to_dict().get(key_fingerprint(cmc_api_key), {}))
@@ -0,0 +1,45 @@
+import pytest
+
+from token_prices import cache, clear_caches
+
+class FakeClock:
+    """
+    Ersatz für das time-Modul (monotonic, sleep): die Zeit läuft nur, wenn ein Test sie vorstellt oder sleep aufruft.
+    """
+
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+        self.sleeps = []
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+    def advance(self, seconds: float):
+        self.now += seconds
+
+class InlineExecutor:
+    """
+    Führt submit() sofort im aufrufenden Thread aus, damit Hintergrund-Erneuerungen deterministisch ablaufen.
+    """
+
+    def submit(self, fn, *args, **kwargs):
+        fn(*args, **kwargs)
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+@pytest.fixture
+def cache_clock(clock, monkeypatch):
+    """
+    ttl_cache mit FakeClock, leerem In-Memory-Cache und synchroner Erneuerung veralteter Einträge.
+    """
+    monkeypatch.setattr(cache, "time", clock)
+    monkeypatch.setattr(cache, "get_revalidate_executor", InlineExecutor)
+    clear_caches()
+    yield clock
+    clear_caches()
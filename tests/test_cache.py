@@ -0,0 +1,145 @@
+import pytest
+
+from token_prices.cache import NotFoundError, closed_period_ttl, ttl_cache
+
+def counting(results):
+    """
+    Upstream-Attrappe: liefert (oder wirft) nacheinander die Werte aus results und zählt die Aufrufe.
+    """
+    calls = []
+
+    def upstream(*args):
+        calls.append(args)
+        result = results[min(len(calls), len(results)) - 1]
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    return upstream, calls
+
+def test_hit_within_ttl_and_miss_after_expiry(cache_clock):
+    upstream, calls = counting(["v1", "v2"])
+
+    @ttl_cache(ttl=10)
+    def fetch(key):
+        return upstream(key)
+
+    assert fetch("a") == "v1"
+    cache_clock.advance(9)
+    assert fetch("a") == "v1"
+    assert len(calls) == 1
+    cache_clock.advance(2)
+    assert fetch("a") == "v2"
+    assert len(calls) == 2
+
+def test_ignored_parameters_share_one_entry(cache_clock):
+    upstream, calls = counting(["v1"])
+
+    @ttl_cache(ttl=10, ignore=("api_key",))
+    def fetch(key, api_key):
+        return upstream(key)
+
+    assert fetch("a", "key-1") == fetch("a", api_key="key-2") == "v1"
+    assert len(calls) == 1
+
+def test_stale_entry_is_served_while_revalidating(cache_clock):
+    upstream, calls = counting(["v1", "v2", "v3"])
+
+    @ttl_cache(ttl=10, max_stale=100)
+    def fetch(key):
+        return upstream(key)
+
+    assert fetch("a") == "v1"
+    cache_clock.advance(15)
+    # Abgelaufen, aber innerhalb max_stale: alter Wert sofort, Erneuerung im "Hintergrund"
+    assert fetch("a") == "v1"
+    assert len(calls) == 2
+    assert fetch("a") == "v2"
+    assert len(calls) == 2
+    # Nach Ablauf von max_stale wartet der Aufrufer wieder auf den Upstream
+    cache_clock.advance(200)
+    assert fetch("a") == "v3"
+    assert len(calls) == 3
+
+def test_not_found_is_cached_for_negative_ttl(cache_clock):
+    upstream, calls = counting([NotFoundError("unbekannt"), "v1"])
+
+    @ttl_cache(ttl=10, max_stale=100, negative_ttl=30)
+    def fetch(key):
+        return upstream(key)
+
+    with pytest.raises(NotFoundError):
+        fetch("a")
+    cache_clock.advance(29)
+    with pytest.raises(NotFoundError):
+        fetch("a")
+    assert len(calls) == 1
+    # Negative Einträge werden nie veraltet ausgeliefert
+    cache_clock.advance(2)
+    assert fetch("a") == "v1"
+    assert len(calls) == 2
+
+def test_transient_failure_is_cached_for_failure_ttl(cache_clock):
+    upstream, calls = counting([None, "v1"])
+
+    @ttl_cache(ttl=10, negative_ttl=30, failure_ttl=5)
+    def fetch(key):
+        return upstream(key)
+
+    assert fetch("a") is None
+    cache_clock.advance(4)
+    assert fetch("a") is None
+    assert len(calls) == 1
+    cache_clock.advance(2)
+    assert fetch("a") == "v1"
+    assert len(calls) == 2
+
+def test_transient_failure_keeps_stale_entry(cache_clock):
+    upstream, calls = counting(["v1", None])
+
+    @ttl_cache(ttl=10, max_stale=100, failure_ttl=5)
+    def fetch(key):
+        return upstream(key)
+
+    assert fetch("a") == "v1"
+    cache_clock.advance(15)
+    assert fetch("a") == "v1"
+    assert len(calls) == 2
+    assert fetch("a") == "v1"
+
+def test_other_exceptions_are_not_cached(cache_clock):
+    upstream, calls = counting([ValueError("5xx"), "v1"])
+
+    @ttl_cache(ttl=10, negative_ttl=30)
+    def fetch(key):
+        return upstream(key)
+
+    with pytest.raises(ValueError):
+        fetch("a")
+    assert fetch("a") == "v1"
+    assert len(calls) == 2
+
+def test_closed_periods_never_expire(cache_clock):
+    upstream, calls = counting(["v1", "v2", "v3"])
+
+    @ttl_cache(ttl=closed_period_ttl("end", open_ttl=5))
+    def fetch(end):
+        return upstream(end)
+
+    assert fetch("2020-12-31") == "v1"
+    assert fetch("2999-12-31") == "v2"
+    cache_clock.advance(10 ** 9)
+    assert fetch("2020-12-31") == "v1"
+    assert fetch("2999-12-31") == "v3"
+    assert len(calls) == 3
+
+def test_clear_drops_entries(cache_clock):
+    upstream, calls = counting(["v1", "v2"])
+
+    @ttl_cache(ttl=closed_period_ttl("end"))
+    def fetch(end):
+        return upstream(end)
+
+    assert fetch("2020-12-31") == "v1"
+    fetch.clear()
+    assert fetch("2020-12-31") == "v2"
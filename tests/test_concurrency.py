@@ -0,0 +1,81 @@
+import threading
+
+import pytest
+
+from token_prices import concurrency
+from token_prices.concurrency import ADAPTIVE_DECREASE_COOLDOWN_S, AdaptiveConcurrency
+
+@pytest.fixture
+def aimd_clock(clock, monkeypatch):
+    monkeypatch.setattr(concurrency, "time", clock)
+    return clock
+
+def test_fast_responses_increase_additively(aimd_clock):
+    limiter = AdaptiveConcurrency(initial=4)
+    limiter.acquire()
+    limiter.release(seconds=0.05)
+
+    assert limiter.limit == pytest.approx(4.25)
+    assert limiter.in_flight == 0
+
+def test_overload_halves_once_per_cooldown(aimd_clock):
+    limiter = AdaptiveConcurrency(initial=8, minimum=1)
+    for _ in range(2):
+        limiter.acquire()
+    limiter.release(overloaded=True)
+    limiter.release(overloaded=True)
+    assert limiter.limit == 4
+    assert limiter.decreases == 1
+
+    aimd_clock.advance(ADAPTIVE_DECREASE_COOLDOWN_S)
+    limiter.acquire()
+    limiter.release(overloaded=True)
+    assert limiter.limit == 2
+    assert limiter.decreases == 2
+
+def test_limit_stays_within_bounds(aimd_clock):
+    limiter = AdaptiveConcurrency(initial=2, minimum=1, maximum=3)
+    for _ in range(5):
+        aimd_clock.advance(ADAPTIVE_DECREASE_COOLDOWN_S)
+        limiter.acquire()
+        limiter.release(overloaded=True)
+    assert limiter.limit == 1
+
+    for _ in range(50):
+        limiter.acquire()
+        limiter.release(seconds=0.05)
+    assert limiter.limit == 3
+
+def test_slow_response_counts_as_overload(aimd_clock):
+    limiter = AdaptiveConcurrency(initial=8)
+    for _ in range(10):
+        limiter.acquire()
+        limiter.release(seconds=0.05)
+    limit = limiter.limit
+
+    aimd_clock.advance(ADAPTIVE_DECREASE_COOLDOWN_S)
+    limiter.acquire()
+    limiter.release(seconds=1.0)
+    assert limiter.limit == pytest.approx(limit / 2)
+
+def test_retry_after_pauses_the_host(aimd_clock):
+    limiter = AdaptiveConcurrency()
+    limiter.acquire()
+    limiter.release(overloaded=True, retry_after=30)
+
+    assert limiter.to_dict()["paused_s"] == 30
+    aimd_clock.advance(30)
+    assert limiter.to_dict()["paused_s"] == 0
+
+def test_acquire_blocks_at_the_limit():
+    limiter = AdaptiveConcurrency(initial=1, minimum=1)
+    limiter.acquire()
+    acquired = threading.Event()
+    waiter = threading.Thread(target=lambda: (limiter.acquire(), acquired.set()))
+    waiter.start()
+
+    assert not acquired.wait(0.05)
+    limiter.release(seconds=0.01)
+    assert acquired.wait(5)
+    waiter.join(5)
+    assert limiter.in_flight == 1
@@ -0,0 +1,48 @@
+import numpy as np
+
+from token_prices.lru import SizedLRU, estimate_size
+
+def test_least_recently_used_entry_is_evicted():
+    lru = SizedLRU(100)
+    lru.put("ns", "a", "A", size=40)
+    lru.put("ns", "b", "B", size=40)
+    assert lru.get("ns", "a") == "A"
+    lru.put("ns", "c", "C", size=40)
+
+    assert lru.get("ns", "b") is None
+    assert lru.get("ns", "a") == "A"
+    assert lru.get("ns", "c") == "C"
+    footprint = lru.footprint()
+    assert footprint["bytes"] == 80
+    assert footprint["evictions"] == 1
+
+def test_oversized_entry_is_not_stored_and_drops_old_value():
+    lru = SizedLRU(100)
+    lru.put("ns", "a", "small", size=10)
+    lru.put("ns", "a", "huge", size=101)
+
+    assert lru.get("ns", "a") is None
+    assert lru.footprint()["bytes"] == 0
+
+def test_replacing_an_entry_updates_the_byte_count():
+    lru = SizedLRU(100)
+    lru.put("ns", "a", "A", size=60)
+    lru.put("ns", "a", "A2", size=30)
+
+    assert lru.get("ns", "a") == "A2"
+    assert lru.footprint()["bytes"] == 30
+
+def test_clear_namespace_keeps_other_namespaces():
+    lru = SizedLRU(100)
+    lru.put("one", "a", "A", size=10)
+    lru.put("two", "a", "B", size=20)
+    lru.clear("one")
+
+    assert lru.get("one", "a") is None
+    assert lru.get("two", "a") == "B"
+    assert lru.footprint()["namespaces"] == {"two": {"entries": 1, "bytes": 20}}
+
+def test_estimate_size_counts_array_buffers():
+    values = np.zeros((365, 6))
+    assert estimate_size(values) >= values.nbytes
+    assert estimate_size({"key": (values, values)}) >= 2 * values.nbytes
@@ -0,0 +1,44 @@
+import pytest
+
+from token_prices import ratelimit
+from token_prices.ratelimit import RateLimiter, TokenBucket
+
+@pytest.fixture
+def bucket_clock(clock, monkeypatch):
+    monkeypatch.setattr(ratelimit, "time", clock)
+    return clock
+
+def test_burst_then_waits_at_rate(bucket_clock):
+    bucket = TokenBucket(rate=1.0, capacity=2)
+
+    assert bucket.acquire() == 0.0
+    assert bucket.acquire() == 0.0
+    assert bucket.acquire() == pytest.approx(1.0)
+    assert bucket.acquire() == pytest.approx(1.0)
+    assert bucket_clock.sleeps == [pytest.approx(1.0), pytest.approx(1.0)]
+
+def test_tokens_refill_up_to_capacity(bucket_clock):
+    bucket = TokenBucket(rate=1.0, capacity=2)
+    bucket.acquire()
+    bucket.acquire()
+    bucket_clock.advance(100)
+
+    assert bucket.acquire() == 0.0
+    assert bucket.acquire() == 0.0
+    assert bucket.acquire() == pytest.approx(1.0)
+
+def test_limiter_keeps_one_bucket_per_key(bucket_clock):
+    limiter = RateLimiter()
+    limiter.register("cmc", calls_per_minute=60, burst=1)
+
+    assert limiter.acquire("cmc", "host", "key-1") == 0.0
+    assert limiter.acquire("cmc", "host", "key-2") == 0.0
+    assert limiter.acquire("cmc", "host", "key-1") == pytest.approx(1.0)
+
+def test_unlimited_and_unknown_limits_never_wait(bucket_clock):
+    limiter = RateLimiter()
+    limiter.register("fx", calls_per_minute=0)
+
+    assert all(limiter.acquire("fx", "host", "key") == 0.0 for _ in range(100))
+    assert limiter.acquire("unknown", "host", "key") == 0.0
+    assert bucket_clock.sleeps == []
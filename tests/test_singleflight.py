@@ -0,0 +1,63 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from token_prices.metrics import collect_metrics, submit_with_context
+from token_prices.singleflight import SingleFlight
+
+def wait_until(condition, timeout: float = 5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "Bedingung nicht rechtzeitig erfüllt"
+        time.sleep(0.001)
+
+def test_concurrent_callers_share_one_call():
+    flights = SingleFlight("fetch.inflight")
+    release = threading.Event()
+    calls = []
+
+    def upstream():
+        calls.append(1)
+        release.wait(5)
+        return "value"
+
+    with collect_metrics() as metrics, ThreadPoolExecutor(max_workers=8) as executor:
+        leader = submit_with_context(executor, flights.do, "key", upstream)
+        wait_until(lambda: flights.in_flight() == 1)
+        followers = [submit_with_context(executor, flights.do, "key", upstream) for _ in range(7)]
+        # Alle Folgeaufrufer warten auf den laufenden Aufruf, bevor er abgeschlossen wird
+        wait_until(lambda: metrics.caches.get("fetch.inflight", {}).get("hits") == 7)
+        release.set()
+        results = [future.result(5) for future in [leader] + followers]
+
+    assert results == ["value"] * 8
+    assert len(calls) == 1
+    assert flights.in_flight() == 0
+
+def test_exception_reaches_followers_and_frees_key():
+    flights = SingleFlight("fetch.inflight")
+    release = threading.Event()
+
+    def failing():
+        release.wait(5)
+        raise ValueError("upstream")
+
+    with collect_metrics() as metrics, ThreadPoolExecutor(max_workers=2) as executor:
+        leader = submit_with_context(executor, flights.do, "key", failing)
+        wait_until(lambda: flights.in_flight() == 1)
+        follower = submit_with_context(executor, flights.do, "key", failing)
+        wait_until(lambda: metrics.caches.get("fetch.inflight", {}).get("hits") == 1)
+        release.set()
+        for future in (leader, follower):
+            with pytest.raises(ValueError):
+                future.result(5)
+
+    assert flights.in_flight() == 0
+    assert flights.do("key", lambda: "retry") == "retry"
+
+def test_different_keys_run_separately():
+    flights = SingleFlight("fetch.inflight")
+    assert flights.do("a", lambda: 1) == 1
+    assert flights.do("b", lambda: 2) == 2
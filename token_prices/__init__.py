@@ -0,0 +1,52 @@
+"""
+Headless Bibliothek für historische Tokenpreise in USD und Fiat-Währungen (CoinMarketCap + exchangerate.host).
+Wird von streamlit_app.py und der Kommandozeile (python -m token_prices) verwendet und hängt nicht von Streamlit ab.
+"""
+from .cache import NotFoundError, cache_footprint, clear_caches, get_memory_cache
+from .cmc import (
+    CMC_CALLS_PER_MINUTE,
+    CmcAddressIndex,
+    estimate_map_credits,
+    estimate_ohlcv_credits,
+    fetch_market_chart_cmc,
+    fetch_token_info_cmc,
+    get_cmc_index,
+    load_ohlcv_range,
+    load_ohlcv_year,
+    load_ohlcv_year_batch,
+    purge_ohlcv_cache,
+    refresh_cmc_index,
+    resolve_token_info,
+)
+from .concurrency import AdaptiveConcurrency, ConcurrencyController, get_concurrency_controller
+from .fx import (
+    FX_MAX_WORKERS,
+    SUPPORTED_CURRENCIES,
+    FxRateStore,
+    fetch_exchange_rate,
+    fetch_exchange_rate_series,
+    fetch_exchange_rates_parallel,
+    get_fx_store,
+    load_fx_rates,
+)
+from .ledger import CreditLedger, UsageLedger, get_credit_ledger, get_usage_ledger, key_fingerprint
+from .lru import SizedLRU, estimate_size
+from .metrics import RunMetrics, collect_metrics, stage
+from .pipeline import (
+    CHAIN_PLATFORMS,
+    CONVERSION_BOTH,
+    CONVERSION_DIRECT,
+    CONVERSION_FX,
+    CONVERSION_MODES,
+    DEFAULT_CURRENCIES,
+    build_batch_price_table,
+    build_price_table,
+    load_price_table,
+    ohlcv_quotes,
+    parse_contract_addresses,
+    price_columns,
+    purge_caches,
+    resolve_tokens,
+    run_pipeline,
+)
+from .ratelimit import RateLimiter, get_rate_limiter
@@ -0,0 +1,172 @@
+import functools
+import inspect
+import math
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timezone
+
+from .lru import CACHE_MAX_BYTES, SizedLRU, estimate_size
+from .metrics import record_cache
+from .singleflight import SingleFlight
+
+# Verzeichnis für persistente Caches (überlebt Neustarts, Redeploys und das Ablaufen der In-Memory-Caches)
+CACHE_DIR = os.environ.get("TOKEN_PRICES_CACHE_DIR", ".cache")
+
+def shared_instance(factory):
+    """
+    Prozessweites Singleton (Ersatz für st.cache_resource): anders als functools.lru_cache wird die Instanz auch bei
+    gleichzeitigem Erstzugriff aus mehreren Sessions und Threads genau einmal erzeugt. .cache_clear() verwirft sie.
+    """
+    lock = threading.Lock()
+    cached = functools.lru_cache(maxsize=None)(factory)
+
+    @functools.wraps(factory)
+    def wrapper():
+        with lock:
+            return cached()
+
+    wrapper.cache_clear = cached.cache_clear
+    return wrapper
+
+# Lebensdauer (Sekunden) von Einträgen, deren Zeitraum bis heute reicht und sich daher noch ändern kann
+OPEN_PERIOD_TTL = float(os.environ.get("TOKEN_PRICES_OPEN_PERIOD_TTL", 300))
+
+def closed_period_ttl(end_param: str, open_ttl: float = OPEN_PERIOD_TTL):
+    """
+    TTL-Policy für ttl_cache: endet der Zeitraum eines Aufrufs (Parameter end_param als date, datetime oder
+    YYYY-MM-DD) vor heute (UTC), sind die Daten abgeschlossen und der Eintrag läuft nie ab (nur clear_caches()
+    entfernt ihn); Zeiträume bis heute laufen nach open_ttl Sekunden ab.
+    """
+    def policy(arguments: dict) -> float:
+        end = arguments[end_param]
+        if isinstance(end, datetime):
+            end = end.date()
+        elif isinstance(end, str):
+            end = date.fromisoformat(end[:10])
+        return math.inf if end < datetime.now(timezone.utc).date() else open_ttl
+    return policy
+
+@shared_instance
+def get_memory_cache() -> SizedLRU:
+    """
+    Gemeinsamer, nach Bytes begrenzter LRU-Speicher aller ttl_cache-Funktionen (Budget CACHE_MAX_BYTES).
+    """
+    return SizedLRU(CACHE_MAX_BYTES)
+
+def clear_caches():
+    """
+    Leert alle In-Memory-Caches des Prozesses (auch nie ablaufende Einträge abgeschlossener Zeiträume).
+    """
+    get_memory_cache().clear()
+
+def cache_footprint() -> dict:
+    """
+    Aktueller Speicherbedarf der In-Memory-Caches (gesamt und je gecachter Funktion).
+    """
+    return get_memory_cache().footprint()
+
+# Anzahl der Hintergrund-Threads, die veraltete Einträge (stale-while-revalidate) erneuern
+REVALIDATE_WORKERS = 4
+
+@shared_instance
+def get_revalidate_executor() -> ThreadPoolExecutor:
+    return ThreadPoolExecutor(max_workers=REVALIDATE_WORKERS, thread_name_prefix="token-prices-revalidate")
+
+class NotFoundError(Exception):
+    """
+    Endgültiges "nicht gefunden" eines Upstreams (z. B. unbekannte Contract-Adresse). ttl_cache merkt sich diese
+    Exception für negative_ttl Sekunden, statt bei jedem Aufruf erneut anzufragen.
+    """
+
+def ttl_cache(ttl, ignore: tuple = (), max_stale: float = 0, negative_ttl: float = 0, failure_ttl: float = 0):
+    """
+    Prozessweiter, threadsicherer In-Memory-Cache (Ersatz für st.cache_data) im gemeinsamen LRU-Speicher
+    get_memory_cache; gleichzeitige Fehlschläge für denselben Schlüssel werden über SingleFlight gebündelt.
+    ttl: Lebensdauer in Sekunden oder Policy über die Argumente (z. B. closed_period_ttl).
+    ignore: Parameter, die nicht zum Schlüssel gehören (z. B. API Keys).
+    max_stale: so lange nach Ablauf wird der alte Eintrag ausgeliefert und im Hintergrund erneuert.
+    negative_ttl: so lange wird eine NotFoundError erneut geworfen.
+    failure_ttl: so lange wird ein Rückgabewert None wiederholt (verdrängt keinen gültigen Eintrag).
+    """
+    def decorator(func):
+        # Einträge im LRU-Speicher: (gültig bis, veraltet nutzbar bis, Wert, NotFoundError oder None)
+        namespace = f"{func.__module__}.{func.__qualname__}"
+        lock = threading.Lock()
+        signature = inspect.signature(func)
+        flights = SingleFlight(f"{func.__name__}.inflight")
+        revalidating = set()
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            key = tuple((name, value) for name, value in bound.arguments.items() if name not in ignore)
+            now = time.monotonic()
+            entry = get_memory_cache().get(namespace, key)
+            if entry is not None and entry[0] > now:
+                record_cache(func.__name__, hit=True)
+                return unwrap(entry)
+            if entry is not None and entry[1] > now:
+                record_cache(func.__name__, hit=True)
+                record_cache(f"{func.__name__}.stale", hit=True)
+                revalidate(key, args, kwargs)
+                return unwrap(entry)
+            record_cache(func.__name__, hit=False)
+            return unwrap(flights.do(key, load, key, args, kwargs), cached=False)
+
+        def unwrap(entry, cached=True):
+            if cached and (entry[3] is not None or entry[2] is None):
+                record_cache(f"{func.__name__}.negative", hit=True)
+            if entry[3] is not None:
+                raise entry[3].with_traceback(None)
+            return entry[2]
+
+        def revalidate(key, args, kwargs):
+            with lock:
+                if key in revalidating:
+                    return
+                revalidating.add(key)
+
+            def run():
+                try:
+                    flights.do(key, load, key, args, kwargs)
+                except Exception:
+                    pass
+                finally:
+                    with lock:
+                        revalidating.discard(key)
+
+            # Ohne Kontext des Aufrufers: die Erneuerung zählt nicht zu den Metriken der auslösenden Session
+            get_revalidate_executor().submit(run)
+
+        def load(key, args, kwargs):
+            # Ein Aufrufer, der knapp nach dem Abschluss eines gebündelten Abrufs kommt, findet hier dessen Eintrag
+            entry = get_memory_cache().get(namespace, key)
+            if entry is not None and entry[0] > time.monotonic():
+                return entry
+            try:
+                value = func(*args, **kwargs)
+            except NotFoundError as e:
+                now = time.monotonic()
+                entry = (now + negative_ttl, now + negative_ttl, None, e)
+            else:
+                now = time.monotonic()
+                if value is None:
+                    if entry is not None and entry[1] > now and entry[2] is not None:
+                        # Vorübergehender Fehlschlag bei der Erneuerung: der bisherige Eintrag bleibt gültig
+                        return entry
+                    entry = (now + failure_ttl, now + failure_ttl, None, None)
+                else:
+                    lifetime = ttl(dict(key)) if callable(ttl) else ttl
+                    entry = (now + lifetime, now + lifetime + max_stale, value, None)
+            get_memory_cache().put(namespace, key, entry, estimate_size(key) + estimate_size(entry[2]))
+            return entry
+
+        def clear():
+            get_memory_cache().clear(namespace)
+
+        wrapper.clear = clear
+        return wrapper
+    return decorator
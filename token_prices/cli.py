@@ -0,0 +1,105 @@
+import argparse
+import os
+import sys
+from datetime import date
+
+from .cmc import estimate_map_credits, estimate_ohlcv_credits, get_cmc_index
+from .fx import FX_MAX_WORKERS, SUPPORTED_CURRENCIES
+from .ledger import get_credit_ledger, key_fingerprint
+from .metrics import collect_metrics, stage
+from .pipeline import (
+    CHAIN_PLATFORMS, CONVERSION_FX, CONVERSION_MODES, DEFAULT_CURRENCIES, ohlcv_quotes, parse_contract_addresses,
+    purge_caches, run_pipeline
+)
+
+def _parse_date(value: str) -> date:
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Ungültiges Datum (erwartet YYYY-MM-DD): {value}")
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="python -m token_prices",
+        description="Historische Tokenpreise in USD und Fiat-Währungen ohne Streamlit abrufen und als Parquet oder CSV exportieren."
+    )
+    parser.add_argument("--chain", required=True, choices=sorted(CHAIN_PLATFORMS.values()),
+                        help="Chain (CoinMarketCap-Plattform) der Contract-Adressen.")
+    parser.add_argument("--address", action="append", default=[],
+                        help="Token Contract-Adresse; kann mehrfach angegeben werden.")
+    parser.add_argument("--address-file",
+                        help="Datei (CSV/TXT), aus der alle Contract-Adressen übernommen werden.")
+    parser.add_argument("--from", dest="start_date", required=True, type=_parse_date, help="Startdatum (YYYY-MM-DD).")
+    parser.add_argument("--to", dest="end_date", required=True, type=_parse_date, help="Enddatum (YYYY-MM-DD).")
+    parser.add_argument("--out",
+                        help="Ausgabedatei; Endung .parquet schreibt Parquet, alle anderen Endungen CSV.")
+    parser.add_argument("--cmc-api-key", default=os.environ.get("CMC_API_KEY", ""),
+                        help="CoinMarketCap API Key (Standard: Umgebungsvariable CMC_API_KEY).")
+    parser.add_argument("--exchange-api-key", default=os.environ.get("EXCHANGE_RATE_API_KEY", ""),
+                        help="Optionaler exchangerate.host API Key (Standard: Umgebungsvariable EXCHANGE_RATE_API_KEY).")
+    parser.add_argument("--fx-workers", type=int, default=FX_MAX_WORKERS,
+                        help="Maximale Anzahl gleichzeitiger Requests für einzeln abgerufene Wechselkurse.")
+    parser.add_argument("--currency", dest="currencies", action="append", choices=SUPPORTED_CURRENCIES,
+                        help="Zielwährung; kann mehrfach angegeben werden (Standard: EUR).")
+    parser.add_argument("--conversion", choices=CONVERSION_MODES, default=CONVERSION_FX,
+                        help="Fiat-Umrechnung: fx (USD-Kurse von exchangerate.host), direct (Kurse direkt von CMC, "
+                             "ohne FX-Requests) oder both (direkt, mit FX-Weg als Abgleich).")
+    parser.add_argument("--estimate-credits", action="store_true",
+                        help="Nur die CMC Credits schätzen (Obergrenze bei leerem Cache) und mit dem Budget vergleichen.")
+    parser.add_argument("--purge-cache", action="store_true",
+                        help="Gespeicherte Kurse (Parquet-OHLCV-Cache und FX-Speicher) vor dem Abruf löschen.")
+    parser.add_argument("--metrics",
+                        help="Laufzeit-Metriken (Requests, Latenzen, Cache-Treffer, Stufen) als JSON in diese Datei schreiben.")
+    return parser
+
+def main(argv=None) -> int:
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    address_file_text = ""
+    if args.address_file:
+        with open(args.address_file, encoding="utf-8", errors="ignore") as f:
+            address_file_text = f.read()
+    addresses = parse_contract_addresses("\n".join(args.address), address_file_text)
+    if not addresses:
+        parser.error("Bitte gib mindestens eine Token Contract-Adresse an (--address oder --address-file).")
+    if args.start_date > args.end_date:
+        parser.error("Das Startdatum muss vor dem Enddatum liegen.")
+    if not args.cmc_api_key:
+        parser.error("Bitte gib einen CoinMarketCap API Key an (--cmc-api-key oder CMC_API_KEY).")
+    currencies = tuple(dict.fromkeys(args.currencies or DEFAULT_CURRENCIES))
+    
+    if args.estimate_credits:
+        map_credits = estimate_map_credits(addresses, args.chain)
+        # Bereits indizierte Tokens werden mit ihrem Parquet-Cache verrechnet, unbekannte wie ein leerer Cache
+        index = get_cmc_index()
+        coin_ids = [(index.lookup(address, args.chain) or {}).get("id") for address in addresses]
+        ohlcv_credits = estimate_ohlcv_credits(
+            coin_ids, args.start_date, args.end_date, ohlcv_quotes(args.conversion, currencies)
+        )
+        credits = map_credits + ohlcv_credits
+        remaining = get_credit_ledger().remaining(key_fingerprint(args.cmc_api_key))
+        print(f"Geschätzte CMC Credits (höchstens): {credits} (Token-Verzeichnis: {map_credits}, OHLCV: {ohlcv_credits})")
+        print(f"Verbleibendes Monatsbudget: {'unbegrenzt' if remaining is None else remaining}")
+        return 0 if remaining is None or credits <= remaining else 1
+    if not args.out:
+        parser.error("Bitte gib eine Ausgabedatei an (--out).")
+    if args.purge_cache:
+        purge_caches(persistent=True)
+    
+    with collect_metrics() as run_metrics:
+        table, failed = run_pipeline(
+            addresses, args.chain, args.start_date, args.end_date, args.cmc_api_key,
+            args.exchange_api_key or None, args.fx_workers, conversion=args.conversion, currencies=currencies
+        )
+        with stage("export"):
+            if args.out.endswith(".parquet"):
+                table.to_parquet(args.out, index=False)
+            else:
+                table.to_csv(args.out, index=False)
+    for address, error in failed:
+        print(f"Nicht gefunden: {address}: {error}", file=sys.stderr)
+    if args.metrics:
+        with open(args.metrics, "w", encoding="utf-8") as f:
+            f.write(run_metrics.to_json())
+    print(f"{len(addresses) - len(failed)} von {len(addresses)} Token, {len(table)} Zeilen -> {args.out}", file=sys.stderr)
+    return 0 if len(failed) < len(addresses) else 1
@@ -0,0 +1,568 @@
+import json
+import math
+import os
+import shutil
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timedelta, date, timezone
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from .cache import CACHE_DIR, NotFoundError, closed_period_ttl, shared_instance, ttl_cache
+from .httpclient import http_get
+from .ledger import get_credit_ledger
+from .metrics import record_cache, submit_with_context
+from .ratelimit import get_rate_limiter
+
+# Basis-URL der CoinMarketCap Pro API (für Benchmarks auf den lokalen Stub-Server umstellbar)
+CMC_BASE_URL = os.environ.get("TOKEN_PRICES_CMC_BASE_URL", "https://pro-api.coinmarketcap.com")
+
+# Anzahl gleichzeitig abgerufener Jahresfenster bei mehrjährigen OHLCV-Zeiträumen
+CMC_MAX_WORKERS = 4
+
+# Aufrufe pro Minute je API Key (CMC Basic: 30); alle Sessions des Prozesses teilen sich das Limit, 0 schaltet es ab
+CMC_CALLS_PER_MINUTE = float(os.environ.get("TOKEN_PRICES_CMC_CALLS_PER_MINUTE", 30))
+get_rate_limiter().register("cmc", CMC_CALLS_PER_MINUTE)
+
+# Wie lange (Sekunden) abgelaufene Token-Informationen und OHLCV-Antworten noch sofort ausgeliefert werden, während
+# sie im Hintergrund erneuert werden; danach wartet der Aufrufer wieder auf CoinMarketCap
+CMC_MAX_STALE = float(os.environ.get("TOKEN_PRICES_CMC_MAX_STALE", 6 * 3600))
+
+# Wie lange (Sekunden) eine unbekannte Contract-Adresse gemerkt wird, bevor CoinMarketCap erneut gefragt wird
+CMC_NOT_FOUND_TTL = float(os.environ.get("TOKEN_PRICES_CMC_NOT_FOUND_TTL", 6 * 3600))
+
+# Credits für einen Aufruf von /v1/cryptocurrency/map (unabhängig von der Anzahl der Treffer)
+CMC_MAP_CREDITS = 1
+
+@ttl_cache(ttl=3600, ignore=("cmc_api_key",), max_stale=CMC_MAX_STALE, negative_ttl=CMC_NOT_FOUND_TTL)
+def fetch_token_info_cmc(contract_addr: str, platform: str, cmc_api_key: str):
+    """
+    Ruft Token-Informationen von CoinMarketCap anhand der Contract-Adresse ab.
+    Verwendet dazu den /v1/cryptocurrency/map Endpoint. Die Daten sind öffentlich, der Cache ist daher nicht
+    nach API Key getrennt; nach Ablauf wird der alte Eintrag bis CMC_MAX_STALE weiter ausgeliefert und im
+    Hintergrund erneuert. Unbekannte Adressen (NotFoundError) werden CMC_NOT_FOUND_TTL Sekunden gemerkt.
+    """
+    url = f"{CMC_BASE_URL}/v1/cryptocurrency/map"
+    params = {"address": contract_addr}
+    # Optional: Filterung nach Plattform (z. B. Ethereum, Arbitrum, Optimism)
+    if platform:
+        params["platform"] = platform
+    headers = {"X-CMC_PRO_API_KEY": cmc_api_key}
+    with get_credit_ledger().spend(cmc_api_key, CMC_MAP_CREDITS):
+        response = http_get(url, params=params, headers=headers, rate_limit="cmc")
+        if response.status_code != 200:
+            raise Exception(
+                f"Fehler beim Abruf der Token-Informationen (CMC) ({response.status_code}). Response: {response.text}"
+            )
+    data = response.json().get("data", [])
+    if not data:
+        raise NotFoundError("Keine Token-Informationen gefunden. Bitte prüfe die Contract-Adresse und den API Key.")
+    # Wähle den ersten Treffer (ggf. weitere Logik implementieren, wenn mehrere Ergebnisse vorliegen)
+    return data[0]
+
+@ttl_cache(ttl=closed_period_ttl("end_dt"), ignore=("cmc_api_key",), max_stale=CMC_MAX_STALE)
+def fetch_market_chart_cmc(coin_ids, start_dt: datetime, end_dt: datetime, cmc_api_key: str, convert: str = "USD"):
+    """
+    Ruft historische OHLCV-Daten (täglich) über /v2/cryptocurrency/ohlcv/historical ab; coin_ids ist eine ID oder ein
+    Tupel von IDs (ein Request), convert die kommagetrennten Kurswährungen. Gecacht werden nur die kompakten Arrays
+    (siehe _parse_ohlcv_arrays): Dict coin_id -> (Tage, Kurswährungen, Werte).
+    """
+    url = f"{CMC_BASE_URL}/v2/cryptocurrency/ohlcv/historical"
+    params = {
+        "id": ",".join(str(coin_id) for coin_id in coin_ids) if isinstance(coin_ids, (tuple, list)) else coin_ids,
+        "time_start": start_dt.strftime("%Y-%m-%d"),
+        "time_end": end_dt.strftime("%Y-%m-%d"),
+        "interval": "daily",
+        "convert": convert
+    }
+    headers = {"X-CMC_PRO_API_KEY": cmc_api_key}
+    credits = (
+        len(coin_ids) if isinstance(coin_ids, (tuple, list)) else 1
+    ) * _ohlcv_credits((end_dt - start_dt).days + 1, len(convert.split(",")))
+    with get_credit_ledger().spend(cmc_api_key, credits):
+        response = http_get(url, params=params, headers=headers, rate_limit="cmc")
+        if response.status_code != 200:
+            raise Exception(
+                f"Fehler beim Abruf der Preisdaten (CMC) ({response.status_code}). Response: {response.text}"
+            )
+    market_data = response.json()
+    quotes = tuple(convert.split(","))
+    return {
+        int(coin_id): _parse_ohlcv_arrays(_extract_quotes(market_data, coin_id), quotes)
+        for coin_id in (coin_ids if isinstance(coin_ids, (tuple, list)) else (coin_ids,))
+    }
+
+# Seitengröße beim Durchblättern von /v1/cryptocurrency/map und Alter, ab dem der lokale Index neu aufgebaut wird
+CMC_MAP_PAGE_SIZE = 5000
+CMC_MAP_MAX_AGE = timedelta(days=7)
+# Wartezeit nach einem fehlgeschlagenen Neuaufbau, bevor das vollständige Listing erneut abgerufen wird
+CMC_MAP_RETRY_BACKOFF = timedelta(minutes=30)
+# Angenommene Seitenzahl des Listings für Kostenschätzungen, solange der Index noch nie aufgebaut wurde
+CMC_MAP_ESTIMATED_PAGES = 10
+
+class CmcAddressIndex:
+    """
+    Lokaler Index Contract-Adresse -> (id, name, symbol, platform), aufgebaut aus dem vollständigen
+    /v1/cryptocurrency/map Listing. Die Tabelle liegt in SQLite, Lookups laufen über ein In-Memory-Dict.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._rebuild_lock = threading.Lock()
+        self._entries = None
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS cmc_map (
+                    address TEXT NOT NULL,
+                    platform TEXT NOT NULL,
+                    id INTEGER NOT NULL,
+                    name TEXT,
+                    symbol TEXT,
+                    slug TEXT,
+                    platform_name TEXT,
+                    PRIMARY KEY (address, platform)
+                )
+                """
+            )
+            conn.execute("CREATE TABLE IF NOT EXISTS cmc_map_meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _row_from_token_info(token_info: dict, fallback_address: str = "", fallback_platform: str = "") -> tuple:
+        platform = token_info.get("platform") or {}
+        address = (platform.get("token_address") or fallback_address).lower()
+        return (
+            address, platform.get("slug") or fallback_platform, token_info["id"], token_info.get("name"),
+            token_info.get("symbol"), token_info.get("slug"), platform.get("name")
+        )
+
+    @staticmethod
+    def _token_info_from_row(row: tuple) -> dict:
+        address, platform, coin_id, name, symbol, slug, platform_name = row
+        return {
+            "id": coin_id, "name": name, "symbol": symbol, "slug": slug,
+            "platform": {"slug": platform, "name": platform_name, "token_address": address}
+        }
+
+    def _load(self) -> dict:
+        with self._lock:
+            if self._entries is None:
+                with self._connect() as conn:
+                    rows = conn.execute(
+                        "SELECT address, platform, id, name, symbol, slug, platform_name FROM cmc_map"
+                    ).fetchall()
+                entries = {}
+                for row in rows:
+                    entries.setdefault(row[0], []).append(self._token_info_from_row(row))
+                self._entries = entries
+            return self._entries
+
+    def _meta(self, key: str):
+        with self._connect() as conn:
+            row = conn.execute("SELECT value FROM cmc_map_meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, conn, key: str, value: str = None):
+        conn.execute(
+            "INSERT OR REPLACE INTO cmc_map_meta (key, value) VALUES (?, ?)",
+            (key, value if value is not None else datetime.now(timezone.utc).isoformat())
+        )
+
+    def built_at(self):
+        built_at = self._meta("built_at")
+        return datetime.fromisoformat(built_at) if built_at else None
+
+    def page_count(self) -> int:
+        """
+        Anzahl der /map Seiten des letzten Neuaufbaus (CMC_MAP_ESTIMATED_PAGES, solange es keinen gab).
+        """
+        pages = self._meta("pages")
+        return int(pages) if pages else CMC_MAP_ESTIMATED_PAGES
+
+    def is_stale(self) -> bool:
+        built_at = self.built_at()
+        return built_at is None or datetime.now(timezone.utc) - built_at > CMC_MAP_MAX_AGE
+
+    def in_backoff(self) -> bool:
+        """
+        True, solange der letzte fehlgeschlagene Neuaufbau weniger als CMC_MAP_RETRY_BACKOFF zurückliegt.
+        """
+        failed_at = self._meta("failed_at")
+        return failed_at is not None and datetime.now(timezone.utc) - datetime.fromisoformat(failed_at) < CMC_MAP_RETRY_BACKOFF
+
+    def refresh_if_stale(self, cmc_api_key: str):
+        """
+        Baut den Index neu auf, wenn er fehlt oder älter als CMC_MAP_MAX_AGE ist (höchstens ein Neuaufbau gleichzeitig).
+        Schlägt der Neuaufbau fehl, wird der Zeitpunkt gespeichert und erst nach CMC_MAP_RETRY_BACKOFF erneut versucht.
+        """
+        with self._rebuild_lock:
+            if self.is_stale() and not self.in_backoff():
+                try:
+                    self.rebuild(cmc_api_key)
+                except Exception:
+                    with self._connect() as conn:
+                        self._set_meta(conn, "failed_at")
+                    raise
+
+    def lookup(self, contract_addr: str, platform: str = ""):
+        """
+        Liefert die Token-Informationen zur Contract-Adresse oder None. Ist platform angegeben, zählen nur Einträge
+        dieser Plattform (dieselbe Adresse kann auf anderen Chains ein anderer Token sein), sonst der erste Treffer.
+        """
+        candidates = self._load().get(contract_addr.lower(), [])
+        if platform:
+            candidates = [
+                token_info for token_info in candidates if (token_info["platform"]["slug"] or "").startswith(platform)
+            ]
+        record_cache("cmc_index", hit=bool(candidates))
+        return candidates[0] if candidates else None
+
+    def add(self, token_info: dict, contract_addr: str, platform: str = ""):
+        """
+        Übernimmt einen einzeln über die API aufgelösten Token (Index-Miss) in den Index.
+        """
+        row = self._row_from_token_info(token_info, contract_addr, platform)
+        with self._connect() as conn:
+            conn.execute("INSERT OR REPLACE INTO cmc_map VALUES (?, ?, ?, ?, ?, ?, ?)", row)
+        # Nur der neue Eintrag wird im Dict ergänzt (wie INSERT OR REPLACE je Adresse und Plattform); neu geladen
+        # wird der Index nur nach rebuild
+        with self._lock:
+            if self._entries is not None:
+                candidates = [
+                    entry for entry in self._entries.get(row[0], []) if entry["platform"]["slug"] != row[1]
+                ]
+                self._entries[row[0]] = candidates + [self._token_info_from_row(row)]
+
+    def rebuild(self, cmc_api_key: str) -> int:
+        """
+        Blättert einmal durch das vollständige /v1/cryptocurrency/map Listing und ersetzt den Index.
+        Gibt die Anzahl der indizierten Contract-Adressen zurück.
+        """
+        url = f"{CMC_BASE_URL}/v1/cryptocurrency/map"
+        headers = {"X-CMC_PRO_API_KEY": cmc_api_key}
+        rows = []
+        start = 1
+        pages = 0
+        while True:
+            pages += 1
+            params = {"start": start, "limit": CMC_MAP_PAGE_SIZE, "listing_status": "active,inactive,untracked"}
+            with get_credit_ledger().spend(cmc_api_key, CMC_MAP_CREDITS):
+                response = http_get(url, params=params, headers=headers, rate_limit="cmc")
+                if response.status_code != 200:
+                    raise Exception(
+                        f"Fehler beim Abruf des Token-Verzeichnisses (CMC) ({response.status_code}). "
+                        f"Response: {response.text}"
+                    )
+            page = response.json().get("data", []) or []
+            rows.extend(
+                self._row_from_token_info(token_info) for token_info in page
+                if (token_info.get("platform") or {}).get("token_address")
+            )
+            if len(page) < CMC_MAP_PAGE_SIZE:
+                break
+            start += CMC_MAP_PAGE_SIZE
+        with self._connect() as conn:
+            conn.execute("DELETE FROM cmc_map")
+            conn.executemany("INSERT OR REPLACE INTO cmc_map VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+            self._set_meta(conn, "built_at")
+            self._set_meta(conn, "pages", str(pages))
+            conn.execute("DELETE FROM cmc_map_meta WHERE key = 'failed_at'")
+        with self._lock:
+            self._entries = None
+        return len(rows)
+
+@shared_instance
+def get_cmc_index() -> CmcAddressIndex:
+    return CmcAddressIndex(os.path.join(CACHE_DIR, "cmc_map.sqlite"))
+
+def refresh_cmc_index(cmc_api_key: str):
+    """
+    Baut den lokalen CMC-Index bei Bedarf neu auf (siehe CmcAddressIndex.refresh_if_stale). Schlägt der Neuaufbau
+    fehl, bleibt der bisherige Index gültig und Misses gehen einzeln an die API.
+    """
+    try:
+        get_cmc_index().refresh_if_stale(cmc_api_key)
+    except Exception:
+        pass
+
+def resolve_token_info(contract_addr: str, platform: str, cmc_api_key: str, refresh: bool = True) -> dict:
+    """
+    Löst eine Contract-Adresse über den lokalen CMC-Index auf. Ist der Index älter als CMC_MAP_MAX_AGE, wird er neu
+    aufgebaut (mit refresh=False nicht, z. B. wenn der Aufrufer refresh_cmc_index einmal für viele Adressen aufruft);
+    nur bei einem Index-Miss wird fetch_token_info_cmc aufgerufen und das Ergebnis in den Index übernommen.
+    """
+    index = get_cmc_index()
+    if refresh:
+        refresh_cmc_index(cmc_api_key)
+    token_info = index.lookup(contract_addr, platform)
+    if token_info is None:
+        token_info = fetch_token_info_cmc(contract_addr, platform, cmc_api_key)
+        index.add(token_info, contract_addr, platform)
+    return token_info
+
+# Felder der täglichen OHLCV-Daten, die im Parquet-Cache gespeichert werden
+OHLCV_FIELDS = ["open", "high", "low", "close", "volume", "market_cap"]
+
+def _extract_quotes(market_data: dict, coin_id: int) -> list:
+    """
+    Liefert die quotes-Liste einer OHLCV-Antwort – sowohl für data.quotes als auch für nach ID geschlüsselte Antworten.
+    """
+    data = market_data.get("data", {}) or {}
+    if "quotes" in data:
+        return data.get("quotes", []) or []
+    return (data.get(str(coin_id), {}) or {}).get("quotes", []) or []
+
+def _parse_ohlcv_arrays(records: list, quotes: tuple) -> tuple:
+    """
+    Wandelt die quotes-Liste einer OHLCV-Antwort in kompakte Arrays um: (Tage als datetime64[D], quotes, float64-Werte
+    Tage x Kurswährungen x OHLCV_FIELDS), fehlende Werte NaN. Die Arrays sind schreibgeschützt, da sie im Cache von
+    allen Sessions gemeinsam genutzt werden.
+    """
+    days = []
+    rows = []
+    for record in records:
+        # Beispiel: "time_close": "2025-01-01T23:59:59.000Z"
+        date_str = (record.get("time_close") or "")[:10]
+        if not date_str:
+            continue
+        record_quotes = record.get("quote") or {}
+        days.append(date_str)
+        rows.append([[(record_quotes.get(quote) or {}).get(field) for field in OHLCV_FIELDS] for quote in quotes])
+    dates = np.array(days, dtype="datetime64[D]")
+    values = np.array(rows, dtype="float64").reshape(len(days), len(quotes), len(OHLCV_FIELDS))
+    dates.flags.writeable = False
+    values.flags.writeable = False
+    return dates, quotes, values
+
+def _ohlcv_frame(dates: np.ndarray, quotes: tuple, values: np.ndarray) -> pd.DataFrame:
+    """
+    Spaltenorientiertes Frame (date, quote, open, ..., market_cap) aus den Arrays von _parse_ohlcv_arrays,
+    eine Zeile je Tag und Kurswährung.
+    """
+    frame = pd.DataFrame(values.reshape(-1, len(OHLCV_FIELDS)), columns=OHLCV_FIELDS)
+    frame.insert(0, "quote", np.tile(np.array(quotes, dtype=object), len(dates)))
+    frame.insert(0, "date", np.repeat(dates, len(quotes)).astype("datetime64[ns]"))
+    return frame
+
+def _ohlcv_cache_path(coin_id: int, year: int) -> str:
+    return os.path.join(CACHE_DIR, "ohlcv", str(coin_id), f"{year}.parquet")
+
+def purge_ohlcv_cache():
+    """
+    Löscht den gesamten Parquet-Cache der OHLCV-Daten (auch abgeschlossene Jahre, die sonst nie neu abgerufen werden).
+    """
+    shutil.rmtree(os.path.join(CACHE_DIR, "ohlcv"), ignore_errors=True)
+
+def _read_ohlcv_cache(path: str):
+    """
+    Liest eine Parquet-Datei des OHLCV-Caches. Gibt (Frame, Dict Kurswährung -> letzter vollständig abgerufener Tag)
+    zurück oder (None, {}).
+    """
+    if not os.path.exists(path):
+        return None, {}
+    table = pq.read_table(path)
+    return table.to_pandas(), _fetched_through(table.schema)
+
+def _fetched_through(schema: pa.Schema) -> dict:
+    raw = (schema.metadata or {}).get(b"fetched_through")
+    if not raw:
+        return {}
+    if raw.startswith(b"{"):
+        return {quote: date.fromisoformat(day) for quote, day in json.loads(raw).items()}
+    # Dateien aus der Zeit vor der Direktumrechnung enthalten nur USD-Kurse und ein einzelnes Datum
+    return {"USD": date.fromisoformat(raw.decode())}
+
+def _read_ohlcv_fetched_through(path: str) -> dict:
+    """
+    Liest nur den Stand (fetched_through) einer Parquet-Datei des OHLCV-Caches, ohne die Daten zu laden.
+    """
+    return _fetched_through(pq.read_schema(path)) if os.path.exists(path) else {}
+
+def _ohlcv_fetch_window(fetched_through: dict, year: int, quotes: tuple, today: date) -> tuple:
+    """
+    Zeitraum (Start, Ende), den load_ohlcv_year_batch für ein Jahr abruft: ab dem ersten nicht vollständig
+    abgerufenen Tag (sonst 1.1.) bis min(31.12., heute); Start > Ende bedeutet, dass nichts abgerufen wird.
+    """
+    start_day = min(
+        fetched_through[quote] + timedelta(days=1) if quote in fetched_through else date(year, 1, 1)
+        for quote in quotes
+    )
+    return start_day, min(date(year, 12, 31), today)
+
+def _write_ohlcv_cache(path: str, frame: pd.DataFrame, fetched_through: dict):
+    """
+    Schreibt eine Parquet-Datei des OHLCV-Caches atomar (temporäre Datei je Prozess und Thread + os.replace), damit
+    parallele Sessions nie eine halb geschriebene Datei lesen. fetched_through wird je Kurswährung in den Metadaten abgelegt.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    table = pa.Table.from_pandas(frame, preserve_index=False)
+    table = table.replace_schema_metadata({
+        **(table.schema.metadata or {}),
+        b"fetched_through": json.dumps({quote: day.isoformat() for quote, day in fetched_through.items()}).encode()
+    })
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    pq.write_table(table, tmp_path)
+    os.replace(tmp_path, path)
+
+# CMC berechnet für /ohlcv/historical 1 Credit je angefangene 100 Datenpunkte und ID (zusätzliche convert-Währungen
+# werden konservativ wie weitere Datenpunkte gezählt); Multi-ID-Requests werden so aufgeteilt, dass ein Request
+# höchstens CMC_OHLCV_MAX_CREDITS_PER_REQUEST Credits und CMC_OHLCV_MAX_IDS IDs umfasst
+CMC_OHLCV_MAX_CREDITS_PER_REQUEST = int(os.environ.get("TOKEN_PRICES_CMC_MAX_CREDITS_PER_REQUEST", 100))
+CMC_OHLCV_MAX_IDS = 100
+# Höchstzahl der convert-Währungen je OHLCV-Request; mehr Kurswährungen werden auf mehrere Requests verteilt
+CMC_OHLCV_MAX_CONVERTS = 3
+
+def _chunk_quotes(quotes: tuple) -> list:
+    """
+    Teilt die Kurswährungen in Gruppen von höchstens CMC_OHLCV_MAX_CONVERTS auf (eine Gruppe je Request).
+    """
+    return [quotes[i:i + CMC_OHLCV_MAX_CONVERTS] for i in range(0, len(quotes), CMC_OHLCV_MAX_CONVERTS)]
+
+def _ohlcv_credits(days: int, quote_count: int = 1) -> int:
+    """
+    Credits je ID für einen Request über days Tage mit quote_count (höchstens CMC_OHLCV_MAX_CONVERTS) Kurswährungen.
+    """
+    return max(1, math.ceil(days / 100)) * max(1, quote_count)
+
+def estimate_ohlcv_credits(coin_ids: list, start_date: date, end_date: date, quotes: tuple = ("USD",)) -> int:
+    """
+    Obergrenze der Credits, die load_ohlcv_range für coin_ids im Zeitraum [start_date, end_date] verbraucht: je Token
+    und Kalenderjahr dasselbe Fenster wie load_ohlcv_year_batch, abzüglich der bereits im Parquet-Cache abgerufenen
+    Tage. Eine coin_id None (noch nicht aufgelöster Token) zählt wie ein leerer Cache.
+    """
+    today = datetime.now(timezone.utc).date()
+    quotes = tuple(dict.fromkeys(quotes))
+    credits = 0
+    for year in range(start_date.year, end_date.year + 1):
+        for coin_id in coin_ids:
+            fetched_through = {} if coin_id is None else _read_ohlcv_fetched_through(_ohlcv_cache_path(coin_id, year))
+            start_day, end_day = _ohlcv_fetch_window(fetched_through, year, quotes, today)
+            if start_day <= end_day:
+                credits += sum(
+                    _ohlcv_credits((end_day - start_day).days + 1, len(quote_group))
+                    for quote_group in _chunk_quotes(quotes)
+                )
+    return credits
+
+def estimate_map_credits(addresses: list, platform: str = "") -> int:
+    """
+    Obergrenze der /v1/cryptocurrency/map Credits für die Auflösung von addresses: ein Credit je Adresse, die nicht im
+    lokalen Index steht, plus die Seiten eines Neuaufbaus, wenn der Index veraltet ist (außer während der Wartezeit
+    nach einem fehlgeschlagenen Neuaufbau).
+    """
+    index = get_cmc_index()
+    credits = CMC_MAP_CREDITS * sum(1 for address in addresses if index.lookup(address, platform) is None)
+    if index.is_stale() and not index.in_backoff():
+        credits += CMC_MAP_CREDITS * index.page_count()
+    return credits
+
+def _chunk_coin_ids(coin_ids: list, days: int, quote_count: int = 1) -> list:
+    """
+    Teilt coin_ids in Gruppen auf, deren geschätzte Kosten unter dem Credit-Limit pro Request bleiben.
+    """
+    per_request = max(1, min(
+        CMC_OHLCV_MAX_IDS, CMC_OHLCV_MAX_CREDITS_PER_REQUEST // _ohlcv_credits(days, quote_count)
+    ))
+    return [coin_ids[i:i + per_request] for i in range(0, len(coin_ids), per_request)]
+
+def load_ohlcv_year_batch(coin_ids: list, year: int, cmc_api_key: str, quotes: tuple = ("USD",)) -> dict:
+    """
+    Liefert die täglichen OHLCV-Daten mehrerer Tokens für ein Kalenderjahr aus dem Parquet-Cache (eine Datei je coin_id
+    und Jahr, eine Zeile je Tag und Kurswährung) als Dict coin_id -> Frame. Abgeschlossene Jahre werden nie erneut
+    abgerufen; für das laufende Jahr wird nur der Zeitraum [letzter vollständig abgerufener Tag + 1, heute] nachgeladen,
+    zukünftige Tage nie. Der Stand wird je Kurswährung geführt, sodass eine neu gewählte Währung (quotes) einmalig
+    nachgeladen wird. Tokens mit gleichem Nachladezeitraum werden gemeinsam in Multi-ID-Requests abgefragt.
+    """
+    today = datetime.now(timezone.utc).date()
+    quotes = tuple(dict.fromkeys(quotes))
+    results = {}
+    cached_entries = {}
+    pending = {}
+    for coin_id in dict.fromkeys(coin_ids):
+        cached, fetched_through = _read_ohlcv_cache(_ohlcv_cache_path(coin_id, year))
+        start_day, end_day = _ohlcv_fetch_window(fetched_through, year, quotes, today)
+        record_cache("ohlcv_parquet", hit=start_day > end_day)
+        if start_day > end_day:
+            results[coin_id] = cached if cached is not None else _ohlcv_frame(*_parse_ohlcv_arrays([], quotes))
+        else:
+            cached_entries[coin_id] = (cached, fetched_through)
+            pending.setdefault(start_day, []).append(coin_id)
+    
+    # Nur abgeschlossene Tage gelten als endgültig abgerufen; der heutige Tag wird beim nächsten Aufruf erneut geladen
+    yesterday = today - timedelta(days=1)
+    end_dt = datetime(end_day.year, end_day.month, end_day.day, tzinfo=timezone.utc)
+    for start_day, group in pending.items():
+        start_dt = datetime(start_day.year, start_day.month, start_day.day, tzinfo=timezone.utc)
+        fetched_parts = {coin_id: [] for coin_id in group}
+        for quote_group in _chunk_quotes(quotes):
+            for chunk in _chunk_coin_ids(group, (end_day - start_day).days + 1, len(quote_group)):
+                market_data = fetch_market_chart_cmc(
+                    tuple(chunk), start_dt, end_dt, cmc_api_key, ",".join(quote_group)
+                )
+                for coin_id in chunk:
+                    fetched_parts[coin_id].append(_ohlcv_frame(*market_data[coin_id]))
+        for coin_id in group:
+            fetched = pd.concat(fetched_parts[coin_id], ignore_index=True)
+            # CMC kann am Fensterrand Tage des Nachbarjahres liefern; jede Datei enthält nur Tage ihres Jahres
+            fetched = fetched[fetched["date"].dt.year == year]
+            cached, fetched_through = cached_entries[coin_id]
+            if cached is not None:
+                # Neu abgerufene Tage ersetzen die gespeicherten Werte derselben Kurswährungen
+                cached = cached[(cached["date"] < pd.Timestamp(start_day)) | ~cached["quote"].isin(quotes)]
+                fetched = pd.concat([cached, fetched], ignore_index=True)
+            fetched = fetched.drop_duplicates(["date", "quote"], keep="last").sort_values(
+                ["date", "quote"], ignore_index=True
+            )
+            fetched_until = min(end_day, max(yesterday, start_day - timedelta(days=1)))
+            _write_ohlcv_cache(
+                _ohlcv_cache_path(coin_id, year), fetched,
+                {**fetched_through, **{quote: fetched_until for quote in quotes}}
+            )
+            results[coin_id] = fetched
+    return results
+
+def load_ohlcv_year(coin_id: int, year: int, cmc_api_key: str, quotes: tuple = ("USD",)) -> pd.DataFrame:
+    """
+    Liefert die täglichen OHLCV-Daten eines Tokens für ein Kalenderjahr (siehe load_ohlcv_year_batch).
+    """
+    return load_ohlcv_year_batch([coin_id], year, cmc_api_key, quotes)[coin_id]
+
+def load_ohlcv_range(coin_ids: list, start_date: date, end_date: date, cmc_api_key: str,
+                     max_workers: int = CMC_MAX_WORKERS, quotes: tuple = ("USD",)) -> dict:
+    """
+    Liefert die täglichen OHLCV-Daten mehrerer Tokens für einen beliebigen Zeitraum als Dict coin_id -> Frame.
+    Der Zeitraum wird in Kalenderjahre zerlegt (jedes Fenster ist einzeln im Parquet-Cache gespeichert und wird
+    von späteren, überlappenden Zeiträumen wiederverwendet), die Fenster werden parallel abgerufen,
+    an den Rändern dedupliziert und zu einer zusammenhängenden Reihe auf [start_date, end_date] zusammengesetzt.
+    """
+    years = list(range(start_date.year, end_date.year + 1))
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [
+            submit_with_context(executor, load_ohlcv_year_batch, coin_ids, year, cmc_api_key, quotes) for year in years
+        ]
+        windows = [future.result() for future in futures]
+    results = {}
+    for coin_id in dict.fromkeys(coin_ids):
+        frame = pd.concat([window[coin_id] for window in windows], ignore_index=True)
+        frame = frame[(frame["date"] >= pd.Timestamp(start_date)) & (frame["date"] <= pd.Timestamp(end_date))]
+        results[coin_id] = frame.drop_duplicates(["date", "quote"], keep="last").sort_values(
+            ["date", "quote"], ignore_index=True
+        )
+    return results
@@ -0,0 +1,122 @@
+import threading
+import time
+
+from .cache import shared_instance
+
+# Startwert, Unter- und Obergrenze der gleichzeitigen Requests je Upstream-Host
+ADAPTIVE_INITIAL_LIMIT = 4
+ADAPTIVE_MIN_LIMIT = 1
+ADAPTIVE_MAX_LIMIT = 32
+# Multiplikative Verringerung bei Überlast (429/503, Timeouts, steigende Latenz), höchstens einmal je Cooldown
+ADAPTIVE_DECREASE_FACTOR = 0.5
+ADAPTIVE_DECREASE_COOLDOWN_S = 1.0
+# Eine Antwort gilt als langsam, wenn sie ADAPTIVE_LATENCY_FACTOR-mal (und mindestens ADAPTIVE_LATENCY_TOLERANCE_S)
+# langsamer ist als die Basislatenz des Hosts
+ADAPTIVE_LATENCY_FACTOR = 2.0
+ADAPTIVE_LATENCY_TOLERANCE_S = 0.1
+
+class AdaptiveConcurrency:
+    """
+    AIMD-Begrenzung der gleichzeitigen Requests an einen Host: jede schnelle, erfolgreiche Antwort erhöht das Limit
+    um 1/Limit (also etwa +1 je Runde), Überlastsignale halbieren es. Retry-After pausiert alle Requests an den Host.
+    """
+
+    def __init__(self, initial: float = ADAPTIVE_INITIAL_LIMIT, minimum: float = ADAPTIVE_MIN_LIMIT,
+                 maximum: float = ADAPTIVE_MAX_LIMIT):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self.latency = None
+        self.baseline = None
+        self.decreases = 0
+        self._last_decrease = 0.0
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        """
+        Wartet, bis eine Pause (Retry-After) abgelaufen und ein Platz unterhalb des aktuellen Limits frei ist.
+        """
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    self._cond.wait(self.paused_until - now)
+                elif self.in_flight < max(self.minimum, int(self.limit)):
+                    self.in_flight += 1
+                    return
+                else:
+                    self._cond.wait()
+
+    def release(self, seconds: float = None, overloaded: bool = False, retry_after: float = None):
+        """
+        Gibt den Platz frei und passt das Limit an: overloaded (429/503, Timeout, Verbindungsfehler) oder eine im
+        Vergleich zur Basislatenz langsame Antwort verringern es, alle anderen Antworten erhöhen es.
+        """
+        with self._cond:
+            self.in_flight -= 1
+            now = time.monotonic()
+            if overloaded or self._is_slow(seconds):
+                if now - self._last_decrease >= ADAPTIVE_DECREASE_COOLDOWN_S:
+                    self.limit = max(self.minimum, self.limit * ADAPTIVE_DECREASE_FACTOR)
+                    self._last_decrease = now
+                    self.decreases += 1
+            else:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            if not overloaded and seconds is not None:
+                self._observe(seconds)
+            if retry_after:
+                self.paused_until = max(self.paused_until, now + retry_after)
+            self._cond.notify_all()
+
+    def _is_slow(self, seconds: float) -> bool:
+        return (
+            seconds is not None and self.baseline is not None
+            and seconds > self.baseline * ADAPTIVE_LATENCY_FACTOR
+            and seconds - self.baseline > ADAPTIVE_LATENCY_TOLERANCE_S
+        )
+
+    def _observe(self, seconds: float):
+        # Geglättete Latenz; die Basislatenz folgt Verbesserungen sofort und Verschlechterungen nur langsam
+        self.latency = seconds if self.latency is None else 0.8 * self.latency + 0.2 * seconds
+        self.baseline = (
+            self.latency if self.baseline is None
+            else min(self.latency, self.baseline + 0.01 * (self.latency - self.baseline))
+        )
+
+    def to_dict(self) -> dict:
+        with self._cond:
+            return {
+                "limit": round(self.limit, 2), "in_flight": self.in_flight, "decreases": self.decreases,
+                "latency_ms": None if self.latency is None else round(self.latency * 1000, 1),
+                "baseline_ms": None if self.baseline is None else round(self.baseline * 1000, 1),
+                "paused_s": round(max(0.0, self.paused_until - time.monotonic()), 2)
+            }
+
+class ConcurrencyController:
+    """
+    Prozessweite AdaptiveConcurrency je Upstream-Host, die sich alle Sessions und Worker-Pools teilen. Die
+    ThreadPoolExecutor der Fetcher geben nur noch die Obergrenze vor; wie viele Requests tatsächlich gleichzeitig
+    laufen, stellt sich je Provider selbst ein.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._hosts = {}
+
+    def for_host(self, host: str) -> AdaptiveConcurrency:
+        with self._lock:
+            limiter = self._hosts.get(host)
+            if limiter is None:
+                limiter = self._hosts[host] = AdaptiveConcurrency()
+            return limiter
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            hosts = dict(self._hosts)
+        return {host: limiter.to_dict() for host, limiter in hosts.items()}
+
+@shared_instance
+def get_concurrency_controller() -> ConcurrencyController:
+    return ConcurrencyController()
@@ -0,0 +1,243 @@
+import os
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from datetime import datetime, timedelta, date, timezone
+
+import pandas as pd
+import requests
+
+from .cache import CACHE_DIR, closed_period_ttl, shared_instance, ttl_cache
+from .httpclient import http_get
+from .metrics import record_cache, submit_with_context
+from .ratelimit import get_rate_limiter
+
+# Basis-URL von exchangerate.host (für Benchmarks auf den lokalen Stub-Server umstellbar)
+FX_BASE_URL = os.environ.get("TOKEN_PRICES_FX_BASE_URL", "https://api.exchangerate.host")
+
+# Aufrufe pro Minute je API Key, die alle Sessions des Prozesses gemeinsam senden dürfen (0: unbegrenzt)
+FX_CALLS_PER_MINUTE = float(os.environ.get("TOKEN_PRICES_FX_CALLS_PER_MINUTE", 0))
+get_rate_limiter().register("fx", FX_CALLS_PER_MINUTE)
+
+# Wie lange (Sekunden) ein fehlgeschlagener Wechselkurs-Abruf gemerkt wird, bevor er erneut versucht wird
+FX_FAILURE_TTL = float(os.environ.get("TOKEN_PRICES_FX_FAILURE_TTL", 60))
+
+# Obergrenze gleichzeitiger Requests, falls Wechselkurse einzeln pro Tag abgerufen werden müssen; wie viele davon
+# tatsächlich gleichzeitig laufen, regelt die adaptive Nebenläufigkeit je Host (siehe concurrency)
+FX_MAX_WORKERS = 16
+
+# Kurswährungen, die als Zielwährung angeboten werden (Basis ist immer USD)
+SUPPORTED_CURRENCIES = ["EUR", "CHF", "GBP", "JPY", "CAD", "AUD", "SEK", "NOK", "DKK", "PLN"]
+
+def _rate_matrix(rates: dict, currencies) -> pd.DataFrame:
+    """
+    Wandelt {YYYY-MM-DD: {Währung: Kurs}} in eine dichte Datum x Währung Matrix (float64, fehlende Kurse NaN) um.
+    """
+    matrix = pd.DataFrame.from_dict(rates, orient="index").reindex(columns=list(currencies)).astype("float64")
+    matrix.index = pd.to_datetime(matrix.index)
+    return matrix.sort_index()
+
+@ttl_cache(ttl=closed_period_ttl("date_str"), ignore=("exchange_api_key",), failure_ttl=FX_FAILURE_TTL)
+def fetch_exchange_rate(date_str: str, exchange_api_key: str = None, symbols: str = "EUR"):
+    """
+    Ruft die historischen USD-Wechselkurse (symbols, kommagetrennt) für ein bestimmtes Datum von exchangerate.host ab.
+    Gibt ein Dict Währung -> Kurs zurück oder None, wenn der Abruf fehlschlägt; ein Fehlschlag wird nur
+    FX_FAILURE_TTL Sekunden gemerkt und danach erneut versucht. Kurse vergangener Tage laufen nie ab.
+    """
+    url = f"{FX_BASE_URL}/{date_str}"
+    params = {"base": "USD", "symbols": symbols}
+    if exchange_api_key:
+        params["access_key"] = exchange_api_key
+    try:
+        response = http_get(url, params=params, rate_limit="fx")
+    except requests.RequestException:
+        return None
+    if response.status_code == 200:
+        data = response.json()
+        return data.get("rates", None) or None
+    else:
+        return None
+
+def fetch_exchange_rates_parallel(dates: list, exchange_api_key: str = None, max_workers: int = FX_MAX_WORKERS,
+                                  progress_callback=None, currencies=("EUR",)) -> pd.DataFrame:
+    """
+    Ruft die Wechselkurse für einzelne Tage parallel über fetch_exchange_rate ab (höchstens max_workers gleichzeitige Requests).
+    Gibt eine nach Datum sortierte Datum x Währung Matrix zurück; progress_callback(erledigt, gesamt) wird nach jedem
+    abgeschlossenen Tag aufgerufen.
+    """
+    rates = {}
+    if dates:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                submit_with_context(
+                    executor, fetch_exchange_rate, day.strftime("%Y-%m-%d"), exchange_api_key, ",".join(currencies)
+                ): day
+                for day in dates
+            }
+            for done, future in enumerate(as_completed(futures), start=1):
+                day_rates = future.result()
+                if day_rates:
+                    rates[futures[future].strftime("%Y-%m-%d")] = day_rates
+                if progress_callback:
+                    progress_callback(done, len(futures))
+    return _rate_matrix(rates, currencies)
+
+# exchangerate.host liefert über den timeseries Endpoint höchstens ein Jahr pro Request
+FX_TIMESERIES_MAX_DAYS = 365
+
+def _date_chunks(start_date: date, end_date: date, max_days: int):
+    """
+    Zerlegt den Zeitraum [start_date, end_date] in aufeinanderfolgende Fenster mit höchstens max_days Tagen.
+    """
+    chunk_start = start_date
+    while chunk_start <= end_date:
+        chunk_end = min(chunk_start + timedelta(days=max_days - 1), end_date)
+        yield chunk_start, chunk_end
+        chunk_start = chunk_end + timedelta(days=1)
+
+@ttl_cache(ttl=closed_period_ttl("end_date"), ignore=("exchange_api_key",), failure_ttl=FX_FAILURE_TTL)
+def _fetch_exchange_rate_window(start_date: date, end_date: date, exchange_api_key: str = None,
+                                symbols: str = "EUR"):
+    """
+    Ein timeseries Request für ein Fenster von höchstens FX_TIMESERIES_MAX_DAYS Tagen. Gibt {YYYY-MM-DD: {Währung:
+    Kurs}} zurück oder None, wenn der Abruf fehlschlägt (wird wie bei fetch_exchange_rate nur kurz gemerkt).
+    """
+    url = f"{FX_BASE_URL}/timeseries"
+    params = {
+        "start_date": start_date.strftime("%Y-%m-%d"),
+        "end_date": end_date.strftime("%Y-%m-%d"),
+        "base": "USD",
+        "symbols": symbols
+    }
+    if exchange_api_key:
+        params["access_key"] = exchange_api_key
+    try:
+        response = http_get(url, params=params, rate_limit="fx")
+    except requests.RequestException:
+        return None
+    if response.status_code != 200:
+        return None
+    rates = {day_str: day_rates for day_str, day_rates in (response.json().get("rates") or {}).items() if day_rates}
+    return rates or None
+
+def fetch_exchange_rate_series(start_date: date, end_date: date, exchange_api_key: str = None,
+                               currencies: tuple = ("EUR",)) -> pd.DataFrame:
+    """
+    Ruft die historischen USD-Wechselkurse aller currencies für den gesamten Zeitraum über den timeseries Endpoint
+    von exchangerate.host ab – alle Währungen in einem Request je Fenster von höchstens FX_TIMESERIES_MAX_DAYS Tagen.
+    Gibt eine Datum x Währung Matrix zurück; Tage ohne Kurse (auch aus fehlgeschlagenen Fenstern) fehlen.
+    """
+    rates = {}
+    for chunk_start, chunk_end in _date_chunks(start_date, end_date, FX_TIMESERIES_MAX_DAYS):
+        window = _fetch_exchange_rate_window(chunk_start, chunk_end, exchange_api_key, ",".join(currencies))
+        rates.update(window or {})
+    return _rate_matrix(rates, currencies)
+
+class FxRateStore:
+    """
+    Persistenter SQLite-Speicher für historische Wechselkurse mit dem Schlüssel (date, base, quote).
+    Jeder Zugriff öffnet eine eigene Verbindung; WAL-Modus und busy timeout erlauben gleichzeitige
+    Zugriffe aus mehreren Streamlit-Sessions, Threads und Worker-Prozessen.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS fx_rates (
+                    date TEXT NOT NULL,
+                    base TEXT NOT NULL,
+                    quote TEXT NOT NULL,
+                    rate REAL NOT NULL,
+                    PRIMARY KEY (date, base, quote)
+                )
+                """
+            )
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get_rates(self, start_date: date, end_date: date, quotes=("EUR",), base: str = "USD") -> pd.DataFrame:
+        """
+        Liefert alle gespeicherten Kurse im Zeitraum [start_date, end_date] als Datum x Währung Matrix.
+        """
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"SELECT date, quote, rate FROM fx_rates WHERE base = ? AND date BETWEEN ? AND ? "
+                f"AND quote IN ({', '.join('?' for _ in quotes)})",
+                (base, start_date.strftime("%Y-%m-%d"), end_date.strftime("%Y-%m-%d"), *quotes)
+            ).fetchall()
+        rates = {}
+        for day_str, quote, rate in rows:
+            rates.setdefault(day_str, {})[quote] = rate
+        return _rate_matrix(rates, quotes)
+
+    def put_rates(self, rates: pd.DataFrame, base: str = "USD"):
+        """
+        Speichert eine Datum x Währung Matrix ab. Nur abgeschlossene Tage (vor heute, UTC) werden übernommen,
+        da sich nur diese nicht mehr ändern.
+        """
+        today = pd.Timestamp(datetime.now(timezone.utc).date())
+        rows = [
+            (day.strftime("%Y-%m-%d"), base, quote, float(rate))
+            for (day, quote), rate in rates[rates.index < today].stack().items()
+            if pd.notna(rate)
+        ]
+        if rows:
+            with self._connect() as conn:
+                conn.executemany("INSERT OR REPLACE INTO fx_rates (date, base, quote, rate) VALUES (?, ?, ?, ?)", rows)
+
+    def clear(self):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM fx_rates")
+
+@shared_instance
+def get_fx_store() -> FxRateStore:
+    return FxRateStore(os.path.join(CACHE_DIR, "fx_rates.sqlite"))
+
+def _missing_days(rates: pd.DataFrame, start_date: date, end_date: date) -> list:
+    """
+    Tage in [start_date, end_date], für die mindestens eine Währung der Matrix keinen Kurs hat.
+    """
+    calendar = pd.date_range(start_date, end_date, freq="D")
+    incomplete = rates.reindex(calendar).isna().any(axis=1)
+    return [day.date() for day in calendar[incomplete.to_numpy()]]
+
+def load_fx_rates(start_date: date, end_date: date, exchange_api_key: str = None, max_workers: int = FX_MAX_WORKERS,
+                  progress_callback=None, currencies=("EUR",)) -> pd.DataFrame:
+    """
+    Liefert die USD-Kurse aller currencies für [start_date, end_date] als dichte Datum x Währung Matrix.
+    Zuerst wird der persistente FX-Speicher gelesen, nur fehlende Tage gehen an exchangerate.host (ein timeseries
+    Request für alle Währungen, danach parallel pro Tag) und werden zurückgeschrieben. Zukünftige Tage werden nie
+    angefragt; im laufenden Jahr umfasst der Abruf damit nur [letzter gespeicherter Tag + 1, heute].
+    """
+    currencies = tuple(dict.fromkeys(currencies))
+    end_date = min(end_date, datetime.now(timezone.utc).date())
+    if start_date > end_date:
+        return _rate_matrix({}, currencies)
+    store = get_fx_store()
+    rates = store.get_rates(start_date, end_date, currencies)
+    missing = _missing_days(rates, start_date, end_date)
+    record_cache("fx_store", hit=True, count=(end_date - start_date).days + 1 - len(missing))
+    record_cache("fx_store", hit=False, count=len(missing))
+    if missing:
+        fetched = fetch_exchange_rate_series(missing[0], missing[-1], exchange_api_key, currencies)
+        rates = rates.combine_first(fetched)
+        still_missing = _missing_days(rates, start_date, end_date)
+        if still_missing:
+            fetched_daily = fetch_exchange_rates_parallel(
+                still_missing, exchange_api_key, max_workers, progress_callback, currencies
+            )
+            fetched = fetched.combine_first(fetched_daily)
+            rates = rates.combine_first(fetched_daily)
+        store.put_rates(fetched)
+    return rates.reindex(columns=list(currencies))
@@ -0,0 +1,108 @@
+import os
+import random
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from .cache import shared_instance
+from .concurrency import get_concurrency_controller
+from .ledger import get_usage_ledger, request_key_fingerprint
+from .metrics import record_request
+from .ratelimit import get_rate_limiter
+
+# Timeouts (Sekunden) und Retry-Verhalten für alle Requests an CoinMarketCap und exchangerate.host
+HTTP_CONNECT_TIMEOUT = float(os.environ.get("TOKEN_PRICES_HTTP_CONNECT_TIMEOUT", 5))
+HTTP_READ_TIMEOUT = float(os.environ.get("TOKEN_PRICES_HTTP_READ_TIMEOUT", 30))
+HTTP_MAX_RETRIES = 4
+HTTP_BACKOFF_FACTOR = 0.5
+HTTP_BACKOFF_JITTER = 0.5
+HTTP_POOL_MAXSIZE = 32
+# Überlast-Statuscodes, die http_get selbst wiederholt (mit Retry-After bzw. Backoff), und die längste Pause,
+# die ein Retry-After Header auslösen darf (Sekunden)
+HTTP_THROTTLE_STATUSES = (429, 503)
+HTTP_MAX_RETRY_AFTER = 60
+
+@shared_instance
+def get_http_session() -> requests.Session:
+    """
+    Prozessweite HTTP-Session, die von allen Streamlit-Sessions und Threads geteilt wird: Connection-Pool je Host mit Keep-Alive,
+    Retries mit exponentiellem Backoff und Jitter bei 500/502/504 und Verbindungsfehlern. 429 und 503 werden nicht
+    hier, sondern in http_get wiederholt (mit Retry-After), damit die adaptive Nebenläufigkeit das Signal sieht.
+    """
+    retry = Retry(
+        total=HTTP_MAX_RETRIES,
+        backoff_factor=HTTP_BACKOFF_FACTOR,
+        backoff_jitter=HTTP_BACKOFF_JITTER,
+        status_forcelist=(500, 502, 504),
+        allowed_methods=frozenset({"GET"}),
+        respect_retry_after_header=False,
+        raise_on_status=False
+    )
+    adapter = HTTPAdapter(pool_connections=8, pool_maxsize=HTTP_POOL_MAXSIZE, max_retries=retry)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+def _retry_after_seconds(response: requests.Response):
+    """
+    Wartezeit aus dem Retry-After Header (Sekunden oder HTTP-Datum), begrenzt auf HTTP_MAX_RETRY_AFTER; sonst None.
+    """
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            seconds = (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds()
+        except (TypeError, ValueError):
+            return None
+    return min(HTTP_MAX_RETRY_AFTER, max(0.0, seconds))
+
+def http_get(url: str, params: dict = None, headers: dict = None,
+             rate_limit: str = None) -> requests.Response:
+    """
+    GET über die gemeinsame Session mit Connect- und Read-Timeout. Nach ausgeschöpften Retries wird die
+    letzte Antwort zurückgegeben, damit die Fetcher den Statuscode wie bisher auswerten können.
+    Dauer und Statuscode (bzw. Fehlerklasse) werden je Host in den Laufzeit-Metriken erfasst und dem API Key
+    (Fingerabdruck), mit dem der Request gesendet wurde, im Usage-Ledger zugeordnet. Mit rate_limit wartet der
+    Request vorher auf einen freien Aufruf des gleichnamigen prozessweiten Limits (siehe ratelimit.RateLimiter).
+    Jeder Versuch belegt einen Platz der adaptiven Nebenläufigkeit des Hosts; 429, 503 und Timeouts verringern sie,
+    Retry-After (bzw. exponentieller Backoff) pausiert alle Requests an den Host, bevor 429/503 erneut versucht wird.
+    """
+    host = urlsplit(url).netloc
+    fingerprint = request_key_fingerprint(params, headers)
+    limiter = get_concurrency_controller().for_host(host)
+    for attempt in range(HTTP_MAX_RETRIES + 1):
+        if rate_limit:
+            get_rate_limiter().acquire(rate_limit, host, fingerprint)
+        limiter.acquire()
+        started = time.perf_counter()
+        try:
+            response = get_http_session().get(
+                url, params=params, headers=headers, timeout=(HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT)
+            )
+        except requests.RequestException as e:
+            seconds = time.perf_counter() - started
+            limiter.release(seconds, overloaded=isinstance(e, (requests.Timeout, requests.ConnectionError)))
+            record_request(host, seconds, type(e).__name__, fingerprint)
+            get_usage_ledger().record(fingerprint, host, type(e).__name__)
+            raise
+        seconds = time.perf_counter() - started
+        retry_after = None
+        if response.status_code in HTTP_THROTTLE_STATUSES:
+            retry_after = _retry_after_seconds(response)
+            if retry_after is None:
+                retry_after = HTTP_BACKOFF_FACTOR * 2 ** attempt + random.uniform(0, HTTP_BACKOFF_JITTER)
+        limiter.release(seconds, overloaded=retry_after is not None, retry_after=retry_after)
+        record_request(host, seconds, response.status_code, fingerprint)
+        get_usage_ledger().record(fingerprint, host, response.status_code)
+        if response.status_code not in HTTP_THROTTLE_STATUSES:
+            break
+    return response
@@ -0,0 +1,176 @@
+import hashlib
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+from .cache import CACHE_DIR, shared_instance
+
+# Stellen, an denen die Fetcher den API Key mitsenden (CMC: Header, exchangerate.host: Query-Parameter)
+CREDENTIAL_HEADERS = ("X-CMC_PRO_API_KEY",)
+CREDENTIAL_PARAMS = ("access_key",)
+
+def key_fingerprint(api_key: str) -> str:
+    """
+    Kurzer, nicht umkehrbarer Fingerabdruck eines API Keys (der Key selbst wird nie gespeichert); "anonym" ohne Key.
+    """
+    if not api_key:
+        return "anonym"
+    return hashlib.sha256(api_key.encode()).hexdigest()[:12]
+
+def request_key_fingerprint(params: dict = None, headers: dict = None) -> str:
+    """
+    Fingerabdruck des API Keys, mit dem ein Request gesendet wird.
+    """
+    for name in CREDENTIAL_HEADERS:
+        if headers and headers.get(name):
+            return key_fingerprint(headers[name])
+    for name in CREDENTIAL_PARAMS:
+        if params and params.get(name):
+            return key_fingerprint(params[name])
+    return key_fingerprint(None)
+
+class UsageLedger:
+    """
+    Prozessweite Zuordnung der Upstream-Requests zu den API Keys, die sie ausgelöst haben. Die Caches für öffentliche
+    Marktdaten sind nicht mehr nach Key getrennt – eine Antwort wird von dem Key bezahlt, der sie zuerst abgerufen hat,
+    und danach allen Sessions ausgeliefert. Das Ledger hält fest, welcher Key wie viele Requests je Host verursacht hat.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.entries = {}
+
+    def record(self, fingerprint: str, host: str, status):
+        with self._lock:
+            entry = self.entries.setdefault(fingerprint, {}).setdefault(host, {"requests": 0, "statuses": {}})
+            entry["requests"] += 1
+            entry["statuses"][str(status)] = entry["statuses"].get(str(status), 0) + 1
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {
+                fingerprint: {host: {"requests": entry["requests"], "statuses": dict(entry["statuses"])}
+                              for host, entry in hosts.items()}
+                for fingerprint, hosts in self.entries.items()
+            }
+
+@shared_instance
+def get_usage_ledger() -> UsageLedger:
+    return UsageLedger()
+
+# Monatliches Credit-Budget je CoinMarketCap API Key (Umgebungsvariable CMC_MONTHLY_CREDIT_BUDGET); ohne Angabe unbegrenzt
+CMC_MONTHLY_CREDIT_BUDGET = int(os.environ.get("CMC_MONTHLY_CREDIT_BUDGET", 0)) or None
+
+class CreditLedger:
+    """
+    Persistentes Credit-Konto je CMC API Key (Fingerabdruck) und Kalendermonat (UTC) in SQLite. Die Fetcher buchen
+    die geschätzten Kosten eines Requests vor dem Senden über spend(); würde das Budget überschritten, wird der Request
+    gar nicht erst gesendet. Schlägt der Request fehl, wird die Buchung zurückgenommen.
+    """
+
+    def __init__(self, path: str, monthly_budget: int = None):
+        self.path = path
+        self.monthly_budget = monthly_budget
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS cmc_credits (
+                    month TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    credits INTEGER NOT NULL,
+                    requests INTEGER NOT NULL,
+                    PRIMARY KEY (month, key)
+                )
+                """
+            )
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _month() -> str:
+        return datetime.now(timezone.utc).strftime("%Y-%m")
+
+    def spent(self, fingerprint: str) -> int:
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT credits FROM cmc_credits WHERE month = ? AND key = ?", (self._month(), fingerprint)
+            ).fetchone()
+        return row[0] if row else 0
+
+    def remaining(self, fingerprint: str):
+        """
+        Verbleibende Credits im laufenden Monat oder None, wenn kein Budget gesetzt ist.
+        """
+        if self.monthly_budget is None:
+            return None
+        return max(0, self.monthly_budget - self.spent(fingerprint))
+
+    def reserve(self, fingerprint: str, credits: int):
+        """
+        Bucht credits für einen Request. Die Prüfung gegen das Budget und die Buchung erfolgen in einem Statement,
+        damit parallele Sessions und Prozesse das Budget gemeinsam nicht überschreiten.
+        """
+        month = self._month()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR IGNORE INTO cmc_credits (month, key, credits, requests) VALUES (?, ?, 0, 0)",
+                (month, fingerprint)
+            )
+            updated = conn.execute(
+                "UPDATE cmc_credits SET credits = credits + ?, requests = requests + 1 "
+                "WHERE month = ? AND key = ? AND (? IS NULL OR credits + ? <= ?)",
+                (credits, month, fingerprint, self.monthly_budget, credits, self.monthly_budget)
+            ).rowcount
+        if not updated:
+            raise Exception(
+                f"Monatliches CMC Credit-Budget erschöpft: der Request würde {credits} Credits kosten, "
+                f"verbleibend sind {self.remaining(fingerprint)} von {self.monthly_budget}."
+            )
+
+    def release(self, fingerprint: str, credits: int):
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE cmc_credits SET credits = MAX(0, credits - ?), requests = MAX(0, requests - 1) "
+                "WHERE month = ? AND key = ?",
+                (credits, self._month(), fingerprint)
+            )
+
+    @contextmanager
+    def spend(self, api_key: str, credits: int):
+        """
+        Reserviert credits für den im with-Block gesendeten Request und gibt sie zurück, wenn der Block mit einer
+        Exception endet (z. B. Statuscode != 200).
+        """
+        fingerprint = key_fingerprint(api_key)
+        self.reserve(fingerprint, credits)
+        try:
+            yield
+        except BaseException:
+            self.release(fingerprint, credits)
+            raise
+
+    def to_dict(self) -> dict:
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT key, credits, requests FROM cmc_credits WHERE month = ?", (self._month(),)
+            ).fetchall()
+        return {
+            key: {"credits": credits, "requests": requests, "budget": self.monthly_budget,
+                  "remaining": None if self.monthly_budget is None else max(0, self.monthly_budget - credits)}
+            for key, credits, requests in rows
+        }
+
+@shared_instance
+def get_credit_ledger() -> CreditLedger:
+    return CreditLedger(os.path.join(CACHE_DIR, "cmc_credits.sqlite"), CMC_MONTHLY_CREDIT_BUDGET)
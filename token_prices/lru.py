@@ -0,0 +1,92 @@
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+# Obergrenze (Bytes) für alle In-Memory-Caches eines Prozesses bzw. Streamlit-Workers zusammen
+CACHE_MAX_BYTES = int(os.environ.get("TOKEN_PRICES_CACHE_MAX_BYTES", 256 * 2 ** 20))
+
+def estimate_size(value) -> int:
+    """
+    Geschätzter Speicherbedarf eines Cache-Werts in Bytes (NumPy-Arrays und DataFrames über ihre Puffer,
+    Container rekursiv).
+    """
+    if isinstance(value, np.ndarray):
+        return max(sys.getsizeof(value), value.nbytes)
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True, index=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(deep=True, index=True))
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_size(k) + estimate_size(v) for k, v in value.items())
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return sys.getsizeof(value) + sum(estimate_size(item) for item in value)
+    return sys.getsizeof(value)
+
+class SizedLRU:
+    """
+    Threadsicherer LRU-Speicher mit Byte-Budget: beim Einfügen werden die am längsten nicht genutzten Einträge
+    verdrängt, bis der geschätzte Gesamtbedarf wieder unter max_bytes liegt. Schlüssel sind (Namensraum, Schlüssel),
+    damit sich alle gecachten Funktionen ein Budget teilen und trotzdem einzeln geleert werden können.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self.evictions = 0
+
+    def get(self, namespace: str, key):
+        with self._lock:
+            item = self._entries.get((namespace, key))
+            if item is None:
+                return None
+            self._entries.move_to_end((namespace, key))
+            return item[0]
+
+    def put(self, namespace: str, key, value, size: int = None):
+        """
+        Speichert value; size ist der geschätzte Bedarf (sonst estimate_size). Einträge, die allein größer als das
+        Budget sind, werden nicht gespeichert.
+        """
+        size = estimate_size(value) if size is None else size
+        with self._lock:
+            old = self._entries.pop((namespace, key), None)
+            if old is not None:
+                self._bytes -= old[1]
+            if size > self.max_bytes:
+                return
+            self._entries[(namespace, key)] = (value, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def clear(self, namespace: str = None):
+        with self._lock:
+            if namespace is None:
+                self._entries.clear()
+                self._bytes = 0
+                return
+            for entry_key in [entry_key for entry_key in self._entries if entry_key[0] == namespace]:
+                self._bytes -= self._entries.pop(entry_key)[1]
+
+    def footprint(self) -> dict:
+        """
+        Aktueller Speicherbedarf: Einträge und Bytes insgesamt und je Namensraum, Budget und Anzahl Verdrängungen.
+        """
+        with self._lock:
+            namespaces = {}
+            for (namespace, _), (_, size) in self._entries.items():
+                usage = namespaces.setdefault(namespace, {"entries": 0, "bytes": 0})
+                usage["entries"] += 1
+                usage["bytes"] += size
+            return {
+                "entries": len(self._entries), "bytes": self._bytes, "max_bytes": self.max_bytes,
+                "evictions": self.evictions, "namespaces": namespaces
+            }
@@ -0,0 +1,118 @@
+import contextvars
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+# Messwerte des aktuell laufenden Abrufs; None, wenn nicht gemessen wird (dann sind alle record_* Aufrufe No-ops)
+_current_metrics = contextvars.ContextVar("token_prices_metrics", default=None)
+
+class RunMetrics:
+    """
+    Messwerte eines Laufs: Aufrufe und Cache-Treffer/-Fehlschläge je Cache (In-Memory und persistent),
+    Requests, Statuscodes, Latenzen und auslösende API Keys (Fingerabdrücke) je Upstream-Host sowie die Dauer der Pipeline-Stufen.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.caches = {}
+        self.requests = {}
+        self.stages = {}
+
+    def record_cache(self, name: str, hit: bool, count: int = 1):
+        with self._lock:
+            entry = self.caches.setdefault(name, {"hits": 0, "misses": 0})
+            entry["hits" if hit else "misses"] += count
+
+    def record_request(self, host: str, seconds: float, status, key: str = None):
+        with self._lock:
+            entry = self.requests.setdefault(host, {"latencies": [], "statuses": {}, "keys": {}})
+            entry["latencies"].append(seconds)
+            entry["statuses"][str(status)] = entry["statuses"].get(str(status), 0) + 1
+            if key is not None:
+                entry["keys"][key] = entry["keys"].get(key, 0) + 1
+
+    def record_stage(self, name: str, seconds: float):
+        with self._lock:
+            self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            caches = {
+                name: {**entry, "calls": entry["hits"] + entry["misses"],
+                       "hit_ratio": round(entry["hits"] / (entry["hits"] + entry["misses"]), 3)
+                       if entry["hits"] + entry["misses"] else None}
+                for name, entry in self.caches.items()
+            }
+            hosts = {}
+            for host, entry in self.requests.items():
+                latencies_ms = np.array(entry["latencies"]) * 1000
+                hosts[host] = {
+                    "requests": len(latencies_ms),
+                    "statuses": dict(entry["statuses"]),
+                    "keys": dict(entry["keys"]),
+                    "p50_ms": round(float(np.percentile(latencies_ms, 50)), 1),
+                    "p95_ms": round(float(np.percentile(latencies_ms, 95)), 1),
+                    "max_ms": round(float(latencies_ms.max()), 1),
+                    "total_s": round(float(latencies_ms.sum()) / 1000, 3)
+                }
+            stages = {name: round(seconds, 4) for name, seconds in self.stages.items()}
+        return {"caches": caches, "hosts": hosts, "stages_s": stages}
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict(), indent=2)
+
+@contextmanager
+def collect_metrics():
+    """
+    Misst alle Abrufe innerhalb des with-Blocks (auch in Worker-Threads, die über submit_with_context gestartet werden).
+    """
+    metrics = RunMetrics()
+    token = _current_metrics.set(metrics)
+    try:
+        yield metrics
+    finally:
+        _current_metrics.reset(token)
+
+def current_metrics():
+    return _current_metrics.get()
+
+def record_cache(name: str, hit: bool, count: int = 1):
+    """
+    Zählt Treffer/Fehlschläge eines Caches. ttl_cache meldet unter dem Funktionsnamen sowie "<Name>.inflight"
+    (gebündelte Aufrufe), "<Name>.stale" (veraltet ausgeliefert) und "<Name>.negative" (negative Treffer).
+    """
+    metrics = _current_metrics.get()
+    if metrics is not None and count:
+        metrics.record_cache(name, hit, count)
+
+def record_request(host: str, seconds: float, status, key: str = None):
+    metrics = _current_metrics.get()
+    if metrics is not None:
+        metrics.record_request(host, seconds, status, key)
+
+def record_stage(name: str, seconds: float):
+    metrics = _current_metrics.get()
+    if metrics is not None:
+        metrics.record_stage(name, seconds)
+
+@contextmanager
+def stage(name: str):
+    """
+    Misst die Dauer einer Pipeline-Stufe (z. B. Tabellenaufbau, CSV-Export).
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics = _current_metrics.get()
+        if metrics is not None:
+            metrics.record_stage(name, time.perf_counter() - started)
+
+def submit_with_context(executor, fn, *args, **kwargs):
+    """
+    executor.submit mit einer Kopie des aktuellen Kontexts, damit Messwerte aus Worker-Threads dem Lauf zugeordnet werden.
+    """
+    return executor.submit(contextvars.copy_context().run, fn, *args, **kwargs)
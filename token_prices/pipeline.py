@@ -0,0 +1,189 @@
+import re
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from .cache import clear_caches
+from .cmc import load_ohlcv_range, purge_ohlcv_cache, refresh_cmc_index, resolve_token_info
+from .fx import FX_MAX_WORKERS, get_fx_store, load_fx_rates
+from .metrics import stage
+
+# Mapping der unterstützen Chains (Plattformen) – ggf. anpassen, falls die Bezeichnungen in CoinMarketCap anders lauten
+CHAIN_PLATFORMS = {
+    "Ethereum": "ethereum",
+    "Arbitrum": "arbitrum",
+    "Optimism": "optimism"
+}
+
+# Umrechnungsmodi für die Fiat-Preise: über die USD-Kurse von exchangerate.host, direkt aus den CMC-Kursen
+# (convert=USD,EUR,..., ohne FX-Requests) oder beides zum Abgleich
+CONVERSION_FX = "fx"
+CONVERSION_DIRECT = "direct"
+CONVERSION_BOTH = "both"
+CONVERSION_MODES = (CONVERSION_FX, CONVERSION_DIRECT, CONVERSION_BOTH)
+
+# Standard-Zielwährung, wenn keine anderen Währungen gewählt werden
+DEFAULT_CURRENCIES = ("EUR",)
+
+def ohlcv_quotes(conversion: str, currencies=DEFAULT_CURRENCIES) -> tuple:
+    """
+    Kurswährungen, die für den Umrechnungsmodus bei CoinMarketCap angefragt werden.
+    """
+    return ("USD",) if conversion == CONVERSION_FX else ("USD",) + tuple(currencies)
+
+def price_columns(conversion: str = CONVERSION_FX, currencies=DEFAULT_CURRENCIES) -> list:
+    columns = ["Date", "Token Price USD"]
+    for currency in currencies:
+        columns += [f"USD/{currency}", f"Token Price {currency}"]
+    if conversion == CONVERSION_BOTH:
+        for currency in currencies:
+            columns += [f"USD/{currency} (FX)", f"Token Price {currency} (FX)", f"Abweichung FX {currency} (%)"]
+    return columns
+
+def _daily_close(ohlcv: pd.DataFrame, quotes, calendar: pd.DatetimeIndex) -> np.ndarray:
+    """
+    Schlusskurse der quotes als Tag x Währung Matrix auf dem Kalender (fehlende Tage NaN).
+    """
+    rows = ohlcv[ohlcv["quote"].isin(quotes)].drop_duplicates(["date", "quote"], keep="last")
+    closes = rows.pivot(index="date", columns="quote", values="close")
+    closes.index = pd.DatetimeIndex(closes.index)
+    return closes.reindex(index=calendar, columns=list(quotes)).to_numpy(dtype="float64")
+
+def _fx_matrix(fx_rates: pd.DataFrame, calendar: pd.DatetimeIndex, currencies) -> np.ndarray:
+    if fx_rates is None:
+        return np.full((len(calendar), len(currencies)), np.nan)
+    rates = fx_rates[~fx_rates.index.duplicated(keep="last")]
+    return rates.reindex(index=calendar, columns=list(currencies)).to_numpy(dtype="float64")
+
+def build_price_table(ohlcv: pd.DataFrame, fx_rates: pd.DataFrame, start_date: date, end_date: date,
+                      conversion: str = CONVERSION_FX, currencies=DEFAULT_CURRENCIES) -> pd.DataFrame:
+    """
+    Verknüpft die Schlusskurse spaltenorientiert auf einem Tageskalender [start_date, end_date] für alle currencies.
+    Im Modus CONVERSION_FX werden die Fiat-Preise in einer einzigen Broadcast-Multiplikation aus dem USD-Schlusskurs
+    (Tage) und der Kursmatrix (Tage x Währungen) berechnet, im Modus CONVERSION_DIRECT direkt aus den Schlusskursen
+    von CMC übernommen (USD/<Währung> ist dann der daraus abgeleitete Kurs); CONVERSION_BOTH ergänzt den FX-Weg als
+    Abgleich. Tage ohne Kurs bleiben leer (NaN).
+    """
+    currencies = list(currencies)
+    calendar = pd.date_range(start_date, end_date, freq="D")
+    usd_close = _daily_close(ohlcv, ["USD"], calendar)
+    columns = {"Date": calendar.strftime("%Y-%m-%d"), "Token Price USD": usd_close[:, 0]}
+    if conversion != CONVERSION_DIRECT:
+        fx_matrix = _fx_matrix(fx_rates, calendar, currencies)
+        fx_prices = usd_close * fx_matrix
+    if conversion == CONVERSION_FX:
+        rates, prices = fx_matrix, fx_prices
+    else:
+        prices = _daily_close(ohlcv, currencies, calendar)
+        rates = prices / usd_close
+    for i, currency in enumerate(currencies):
+        columns[f"USD/{currency}"] = rates[:, i]
+        columns[f"Token Price {currency}"] = prices[:, i]
+    if conversion == CONVERSION_BOTH:
+        deviation = (fx_prices / prices - 1) * 100
+        for i, currency in enumerate(currencies):
+            columns[f"USD/{currency} (FX)"] = fx_matrix[:, i]
+            columns[f"Token Price {currency} (FX)"] = fx_prices[:, i]
+            columns[f"Abweichung FX {currency} (%)"] = deviation[:, i]
+    return pd.DataFrame(columns)
+
+def parse_contract_addresses(*texts: str) -> list:
+    """
+    Extrahiert alle EVM Contract-Adressen (0x + 40 Hex-Zeichen) aus eingefügtem Text oder hochgeladenen Dateien.
+    Duplikate (unabhängig von Groß-/Kleinschreibung) werden entfernt, die Reihenfolge bleibt erhalten.
+    """
+    addresses = {}
+    for text in texts:
+        for address in re.findall(r"0x[0-9a-fA-F]{40}", text or ""):
+            addresses.setdefault(address.lower(), address)
+    return list(addresses.values())
+
+def build_batch_price_table(tokens: list, ohlcv_by_id: dict, fx_rates: pd.DataFrame, start_date: date, end_date: date,
+                            conversion: str = CONVERSION_FX, currencies=DEFAULT_CURRENCIES) -> pd.DataFrame:
+    """
+    Baut eine Tabelle im Long-Format (eine Zeile je Token und Tag) für mehrere Tokens; tokens ist eine Liste von
+    (Contract-Adresse, Token-Informationen). Die Wechselkurse werden für alle Tokens gemeinsam verwendet.
+    """
+    frames = []
+    for address, token_info in tokens:
+        frame = build_price_table(
+            ohlcv_by_id[token_info["id"]], fx_rates, start_date, end_date, conversion, currencies
+        )
+        frame.insert(0, "Contract Address", address)
+        frame.insert(0, "Symbol", (token_info.get("symbol") or "").upper())
+        frames.append(frame)
+    if not frames:
+        return pd.DataFrame(columns=["Symbol", "Contract Address"] + price_columns(conversion, currencies))
+    return pd.concat(frames, ignore_index=True)
+
+def resolve_tokens(addresses: list, platform: str, cmc_api_key: str):
+    """
+    Löst mehrere Contract-Adressen auf (der CMC-Index wird dafür höchstens einmal neu aufgebaut). Gibt (tokens, failed)
+    zurück: tokens ist eine Liste von (Contract-Adresse, Token-Informationen), failed eine Liste von
+    (Contract-Adresse, Exception).
+    """
+    tokens = []
+    failed = []
+    refresh_cmc_index(cmc_api_key)
+    for address in addresses:
+        try:
+            token_info = resolve_token_info(address, platform, cmc_api_key, refresh=False)
+            if token_info.get("id") is None:
+                raise Exception("Kein Token ID in den abgerufenen Daten gefunden.")
+            tokens.append((address, token_info))
+        except Exception as e:
+            failed.append((address, e))
+    return tokens, failed
+
+def load_price_table(tokens: list, start_date: date, end_date: date, cmc_api_key: str, exchange_api_key: str = None,
+                     fx_max_workers: int = FX_MAX_WORKERS, progress_callback=None, conversion: str = CONVERSION_FX,
+                     currencies=DEFAULT_CURRENCIES) -> pd.DataFrame:
+    """
+    Lädt für aufgelöste tokens (siehe resolve_tokens) die OHLCV-Daten und (außer im Modus CONVERSION_DIRECT) die
+    USD-Kurse aller currencies in einem FX-Abruf und verknüpft sie zu einer Tabelle im Long-Format.
+    progress_callback(done, total) meldet den Fortschritt der einzeln abgerufenen Wechselkurse.
+    """
+    if not tokens:
+        return build_batch_price_table([], {}, None, start_date, end_date, conversion, currencies)
+    with stage("ohlcv"):
+        ohlcv_by_id = load_ohlcv_range(
+            [token_info["id"] for _, token_info in tokens], start_date, end_date, cmc_api_key,
+            quotes=ohlcv_quotes(conversion, currencies)
+        )
+    fx_rates = None
+    if conversion != CONVERSION_DIRECT:
+        with stage("fx"):
+            fx_rates = load_fx_rates(
+                start_date, end_date, exchange_api_key, fx_max_workers, progress_callback, currencies
+            )
+    with stage("table_build"):
+        return build_batch_price_table(
+            tokens, ohlcv_by_id, fx_rates, start_date, end_date, conversion, currencies
+        )
+
+def run_pipeline(addresses: list, platform: str, start_date: date, end_date: date, cmc_api_key: str,
+                 exchange_api_key: str = None, fx_max_workers: int = FX_MAX_WORKERS, progress_callback=None,
+                 conversion: str = CONVERSION_FX, currencies=DEFAULT_CURRENCIES):
+    """
+    Führt den vollständigen Abruf ohne UI aus: Contract-Adressen auflösen (resolve_tokens) und die Preistabelle laden
+    (load_price_table).
+    Gibt (Tabelle, failed) zurück; failed wie bei resolve_tokens.
+    """
+    with stage("resolve_tokens"):
+        tokens, failed = resolve_tokens(addresses, platform, cmc_api_key)
+    table = load_price_table(
+        tokens, start_date, end_date, cmc_api_key, exchange_api_key, fx_max_workers, progress_callback, conversion,
+        currencies
+    )
+    return table, failed
+
+def purge_caches(persistent: bool = False):
+    """
+    Leert alle In-Memory-Caches; mit persistent zusätzlich die gespeicherten Kurse (Parquet-OHLCV-Cache und
+    FX-Speicher). Der CMC-Adressindex und das Credit-Konto bleiben erhalten.
+    """
+    clear_caches()
+    if persistent:
+        purge_ohlcv_cache()
+        get_fx_store().clear()
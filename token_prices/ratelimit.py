@@ -0,0 +1,70 @@
+import threading
+import time
+
+from .cache import shared_instance
+from .metrics import record_stage
+
+class TokenBucket:
+    """
+    Token Bucket mit rate Aufrufen pro Sekunde und höchstens capacity angesparten Aufrufen. acquire() reserviert einen
+    Aufruf und wartet, bis er fällig ist; Wartende werden in der Reihenfolge ihrer Reservierung bedient.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if wait:
+            time.sleep(wait)
+        return wait
+
+class RateLimiter:
+    """
+    Prozessweite Begrenzung der Upstream-Aufrufe, die sich alle Streamlit-Sessions teilen: je registriertem Limit
+    (z. B. "cmc"), Host und API Key (Fingerabdruck) ein eigener Token Bucket. Requests warten auf einen freien Aufruf,
+    statt mit 429 abgelehnt zu werden.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._limits = {}
+        self._buckets = {}
+
+    def register(self, name: str, calls_per_minute: float, burst: float = None):
+        """
+        Legt das Limit name fest; calls_per_minute <= 0 schaltet die Begrenzung ab. burst ist die Anzahl Aufrufe,
+        die nach einer Pause ohne Wartezeit erfolgen dürfen (Standard: ein Viertel des Minutenlimits).
+        """
+        with self._lock:
+            self._limits[name] = (calls_per_minute, burst or max(1.0, calls_per_minute / 4))
+            self._buckets = {key: bucket for key, bucket in self._buckets.items() if key[0] != name}
+
+    def acquire(self, name: str, host: str, fingerprint: str) -> float:
+        """
+        Wartet auf einen freien Aufruf und gibt die Wartezeit in Sekunden zurück (0 für unbegrenzte Limits).
+        """
+        with self._lock:
+            calls_per_minute, burst = self._limits.get(name, (0, 0))
+            if calls_per_minute <= 0:
+                return 0.0
+            bucket = self._buckets.get((name, host, fingerprint))
+            if bucket is None:
+                bucket = self._buckets[(name, host, fingerprint)] = TokenBucket(calls_per_minute / 60, burst)
+        wait = bucket.acquire()
+        if wait:
+            record_stage("rate_limit_wait", wait)
+        return wait
+
+@shared_instance
+def get_rate_limiter() -> RateLimiter:
+    return RateLimiter()
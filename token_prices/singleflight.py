@@ -0,0 +1,43 @@
+import threading
+from concurrent.futures import Future
+
+from .metrics import record_cache
+
+class SingleFlight:
+    """
+    Bündelt gleichzeitige, identische Aufrufe innerhalb des Prozesses: der erste Aufrufer für einen Schlüssel führt
+    die Funktion aus, alle weiteren Aufrufer mit demselben Schlüssel warten auf dessen Ergebnis (oder Exception),
+    statt denselben Upstream-Request ein weiteres Mal auszulösen. Nach Abschluss wird der Schlüssel wieder freigegeben.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn, *args, **kwargs):
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._calls[key] = future
+        if not leader:
+            record_cache(self.name, hit=True)
+            return future.result()
+        record_cache(self.name, hit=False)
+        try:
+            value = fn(*args, **kwargs)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(value)
+            return value
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)